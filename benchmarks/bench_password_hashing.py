@@ -0,0 +1,110 @@
+"""
+Login throughput vs. PBKDF2 cost.
+
+For each iteration count, signs up one user (so the stored hash has that
+cost) and fires --requests POST /api/login calls from --concurrency client
+threads through the Flask test client, while one more thread keeps calling
+GET /api/hello to show how much the burst delays unrelated requests.
+
+    python benchmarks/bench_password_hashing.py --iterations 100000,600000,1000000
+
+Runs against a throwaway SQLite database; set PASSWORD_HASH_WORKERS /
+PASSWORD_HASH_QUEUE to try other pool sizes.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+DB_PATH = Path(tempfile.gettempdir()) / "bench_password_hashing.db"
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ.setdefault("FLASK_APP_KEY", "bench")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from app import app  # noqa: E402
+from api.models import db  # noqa: E402
+from api.passwords import password_hasher  # noqa: E402
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run(iterations, requests, concurrency):
+    password_hasher.configure(iterations, password_hasher.workers, password_hasher.queue)
+    client = app.test_client()
+    email = f"bench-{iterations}@example.com"
+    client.post("/api/signup", json={"email": email, "password": "secret", "username": "bench"})
+
+    def login(_):
+        start = time.perf_counter()
+        status = client.post("/api/login", json={"email": email, "password": "secret"}).status_code
+        return status, time.perf_counter() - start
+
+    probes = []
+    done = threading.Event()
+
+    def probe():
+        while not done.is_set():
+            start = time.perf_counter()
+            client.get("/api/hello")
+            probes.append(time.perf_counter() - start)
+            time.sleep(0.005)
+
+    prober = threading.Thread(target=probe)
+    prober.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(login, range(requests)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    prober.join()
+
+    ok = [latency for status, latency in results if status == 201]
+    busy = sum(1 for status, _ in results if status == 503)
+    return {
+        "iterations": iterations,
+        "ok": len(ok),
+        "busy_503": busy,
+        "logins_per_sec": len(ok) / elapsed,
+        "login_p50_ms": statistics.median(ok) * 1000 if ok else 0.0,
+        "login_p95_ms": percentile(ok, 95) * 1000,
+        "probe_p95_ms": percentile(probes, 95) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", default="100000,300000,600000,1000000",
+                        help="comma-separated PBKDF2 iteration counts")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    if DB_PATH.exists():
+        DB_PATH.unlink()
+    with app.app_context():
+        db.create_all()
+
+    print(f"pool: {password_hasher.workers} threads, queue {password_hasher.queue}; "
+          f"{args.requests} logins, {args.concurrency} clients")
+    print(f"{'iterations':>10} {'ok':>4} {'503':>4} {'login/s':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'probe p95':>10}")
+    for iterations in (int(value) for value in args.iterations.split(",")):
+        row = run(iterations, args.requests, args.concurrency)
+        print(f"{row['iterations']:>10} {row['ok']:>4} {row['busy_503']:>4} "
+              f"{row['logins_per_sec']:>8.1f} {row['login_p50_ms']:>8.1f} "
+              f"{row['login_p95_ms']:>8.1f} {row['probe_p95_ms']:>10.1f}")
+    DB_PATH.unlink()
+
+
+if __name__ == "__main__":
+    main()
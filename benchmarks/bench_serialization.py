@@ -0,0 +1,113 @@
+"""
+ORM hydration + jsonify vs. column projection + orjson for the list endpoints.
+
+Seeds --rows locations, users and fish into a throwaway SQLite file, then
+times GET /api/location, /api/users and /api/fish-species (the full-array
+form) under every combination of the FAST_SERIALIZE switch and JSON
+provider, reporting the median of --repeat requests.
+
+    python benchmarks/bench_serialization.py --rows 20000 --repeat 7
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+DB_PATH = Path(tempfile.gettempdir()) / "bench_serialization.db"
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ.setdefault("FLASK_APP_KEY", "bench")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from app import app  # noqa: E402
+from api.cache import location_cache  # noqa: E402
+from api.geo import encode_geohash  # noqa: E402
+from api.json_provider import OrjsonProvider, orjson  # noqa: E402
+from api.models import db, User, Location, Fish, user_likes  # noqa: E402
+
+ENDPOINTS = {
+    "location": "/api/location",
+    "users": "/api/users",
+    "fish": "/api/fish-species",
+}
+
+
+def seed(rows):
+    rng = random.Random(1)
+    users = max(1, rows // 10)
+    db.session.execute(insert(User), [
+        {"email": f"user{i}@example.com", "password": "x", "user_name": f"user{i}"}
+        for i in range(users)])
+    locations = []
+    for i in range(rows):
+        lat, lng = rng.uniform(25, 48), rng.uniform(-124, -67)
+        locations.append({
+            "name": f"Spot {i}", "type": rng.choice(["fishing", "hunting"]),
+            "position": {"lat": lat, "lng": lng}, "lat": lat, "lng": lng,
+            "geohash": encode_geohash(lat, lng), "directions": "n/a",
+            "creator_id": rng.randint(1, users)})
+    db.session.execute(insert(Location), locations)
+    pairs = {(rng.randint(1, users), rng.randint(1, rows)) for _ in range(rows)}
+    db.session.execute(insert(user_likes), [
+        {"user_id": user_id, "location_id": location_id} for user_id, location_id in pairs])
+    db.session.execute(insert(Fish), [
+        {"name": f"Fish {i}", "wiki_link": f"https://example.com/wiki/{i}",
+         "image_link": f"https://example.com/img/{i}.jpg"} for i in range(rows)])
+    db.session.commit()
+
+
+def time_endpoint(client, url, repeat):
+    timings = []
+    size = 0
+    for _ in range(repeat):
+        # the location list is cached between identical requests, bypass it
+        location_cache.maxsize = 0
+        start = time.perf_counter()
+        response = client.get(url)
+        body = response.get_data()
+        timings.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.status_code
+        size = len(body)
+    return statistics.median(timings), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if DB_PATH.exists():
+        DB_PATH.unlink()
+    with app.app_context():
+        db.create_all()
+        seed(args.rows)
+
+    providers = [("default", DefaultJSONProvider(app))]
+    if orjson is not None:
+        providers.append(("orjson", OrjsonProvider(app)))
+    client = app.test_client()
+
+    print(f"{args.rows} rows per table, median of {args.repeat} requests")
+    print(f"{'endpoint':<10} {'path':<10} {'json':<8} {'ms':>9} {'speedup':>8} {'bytes':>10}")
+    for name, url in ENDPOINTS.items():
+        baseline = None
+        for fast in (False, True):
+            for provider_name, provider in providers:
+                app.json = provider
+                app.config["FAST_SERIALIZE"] = {name} if fast else set()
+                seconds, size = time_endpoint(client, url, args.repeat)
+                baseline = baseline or seconds
+                print(f"{name:<10} {'columns' if fast else 'orm':<10} {provider_name:<8} "
+                      f"{seconds * 1000:>9.1f} {baseline / seconds:>7.2f}x {size:>10}")
+    DB_PATH.unlink()
+
+
+if __name__ == "__main__":
+    main()
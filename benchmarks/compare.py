@@ -0,0 +1,85 @@
+"""
+Compare two benchmarks/load_test.py result files.
+
+Prints throughput, p50/p95/p99 latency and peak RSS per scenario with the
+change from BASE to NEW, marking changes worse than --threshold percent,
+and exits with status 1 if any scenario regressed (or started failing).
+
+    python benchmarks/compare.py benchmarks/results/abc1234-100000.json benchmarks/results/def5678-100000.json
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# metric, path in a scenario result, True if higher is better
+METRICS = (
+    ("req/s", ("throughput_rps",), True),
+    ("p50 ms", ("latency_ms", "p50"), False),
+    ("p95 ms", ("latency_ms", "p95"), False),
+    ("p99 ms", ("latency_ms", "p99"), False),
+    ("rss MB", ("peak_rss_mb",), False),
+)
+# settings that make two runs incomparable when they differ
+SETTINGS = ("database", "locations", "users", "seed", "workers", "threads",
+            "concurrency", "password_iterations", "cpus")
+
+
+def lookup(result, path):
+    for key in path:
+        if result is None:
+            return None
+        result = result.get(key)
+    return result
+
+
+def change(base, new):
+    if base in (None, 0) or new is None:
+        return None
+    return (new - base) / base * 100
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("base", type=Path)
+    parser.add_argument("new", type=Path)
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="percent change counted as a regression")
+    args = parser.parse_args()
+    base = json.loads(args.base.read_text())
+    new = json.loads(args.new.read_text())
+
+    print(f"base {base['meta']['commit']}  ->  new {new['meta']['commit']}")
+    for setting in SETTINGS:
+        if base["meta"].get(setting) != new["meta"].get(setting):
+            print(f"warning: {setting} differs "
+                  f"({base['meta'].get(setting)} vs {new['meta'].get(setting)})")
+
+    regressions = []
+    print(f"{'scenario':<14} {'metric':<7} {'base':>10} {'new':>10} {'change':>9}")
+    for name in sorted(set(base["scenarios"]) | set(new["scenarios"])):
+        before, after = base["scenarios"].get(name), new["scenarios"].get(name)
+        if before is None or after is None:
+            print(f"{name:<14} only in {'new' if before is None else 'base'}")
+            continue
+        for label, path, higher_is_better in METRICS:
+            old_value, new_value = lookup(before, path), lookup(after, path)
+            pct = change(old_value, new_value)
+            worse = pct is not None and (-pct if higher_is_better else pct) > args.threshold
+            if worse:
+                regressions.append(f"{name} {label}")
+            print(f"{name:<14} {label:<7} {old_value if old_value is not None else '-':>10} "
+                  f"{new_value if new_value is not None else '-':>10} "
+                  f"{'' if pct is None else f'{pct:+.1f}%':>9}{'  <-- worse' if worse else ''}")
+        if after["errors"] > before["errors"]:
+            regressions.append(f"{name} errors")
+            print(f"{name:<14} errors  {before['errors']:>10} {after['errors']:>10}  <-- worse")
+
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:g}%: {', '.join(regressions)}")
+        sys.exit(1)
+    print("no regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Seed a database with a synthetic dataset for the HTTP benchmarks.
+
+A thin wrapper around api.generate (`flask generate-data`) that creates the
+tables, refuses to add to a non-empty database, and can skip seeding when
+the row counts already match. Locations are clustered around the cities in
+src/data/usa-cities-geo.json and likes follow a power law; see
+src/api/generate.py. User ids start at 1, every password is BENCH_PASSWORD,
+hashed once with the current PASSWORD_HASH_ITERATIONS; the server must run
+with the same value or logins rewrite the hashes.
+
+The same --seed always produces the same rows.
+
+    python benchmarks/dataset.py --database-url sqlite:////tmp/bench.db --locations 100k
+    python benchmarks/dataset.py --database-url postgresql://localhost/bench --locations 1m --reset
+"""
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+from api.commands import parse_count  # noqa: E402
+from api.generate import generated_email  # noqa: E402
+
+CITIES_FILE = ROOT / "src" / "data" / "usa-cities-geo.json"
+BENCH_PASSWORD = "bench-password"
+
+
+def bench_email(index):
+    """Email of the index-th (0-based) seeded user."""
+    return generated_email(index + 1)
+
+
+def seed(locations, users, seed_value=1, reset=False, skip_if_seeded=False, workers=1):
+    """Fill the database at DATABASE_URL. Returns the row counts."""
+    from sqlalchemy import func, select
+
+    from app import app
+    from api.commands import StageTimer
+    from api.generate import generate, load_cities
+    from api.models import db, User, Location
+
+    with app.app_context():
+        if reset:
+            db.drop_all()
+        db.create_all()
+        existing = (db.session.scalar(select(func.count()).select_from(Location)),
+                    db.session.scalar(select(func.count()).select_from(User)))
+        if skip_if_seeded and existing == (locations, users):
+            return {"locations": locations, "users": users, "skipped": True}
+        if any(existing):
+            raise SystemExit("database is not empty, pass --reset to start over")
+        timer = StageTimer()
+        counts = generate(timer, users, locations, load_cities(CITIES_FILE), seed=seed_value,
+                          password=BENCH_PASSWORD, workers=workers)
+        counts["seconds"] = round(sum(timer.stages.values()), 1)
+        return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--locations", type=parse_count, default=parse_count("10k"))
+    parser.add_argument("--users", type=parse_count, help="default: locations / 10")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes used to generate locations")
+    parser.add_argument("--reset", action="store_true", help="drop and recreate all tables first")
+    parser.add_argument("--skip-if-seeded", action="store_true",
+                        help="do nothing if the row counts already match")
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("--database-url or DATABASE_URL is required")
+
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("FLASK_APP_KEY", "bench")
+    users = args.users if args.users is not None else max(1, args.locations // 10)
+    print(json.dumps(seed(args.locations, users, args.seed, args.reset, args.skip_if_seeded,
+                          args.workers)))
+
+
+if __name__ == "__main__":
+    main()
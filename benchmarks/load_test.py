@@ -0,0 +1,378 @@
+"""
+HTTP load test of the API as deployed: gunicorn serving src/wsgi.py.
+
+Seeds a database at the chosen scale with benchmarks/dataset.py (kept and
+reused between runs), starts gunicorn with the Procfile's settings on a
+free local port, logs in a pool of users, and then drives each scenario for
+--duration seconds, after --warmup seconds, from --concurrency keep-alive
+client threads:
+
+    location_page   GET /api/location?limit=100&after=<random id>
+    location_bbox   GET /api/location?bbox=<~10 km box on a random city>
+    user_get        GET /api/user
+    user_put        PUT /api/user with a new zipcode
+    login           POST /api/login as a random user
+
+For each scenario, p50/p95/p99/mean/max latency, throughput, status counts
+and the peak RSS of the gunicorn processes (master + workers, Linux only)
+are written to --output as JSON with the commit and settings. Compare two
+runs with benchmarks/compare.py.
+
+    python benchmarks/load_test.py --scale 100k --concurrency 16 --duration 20
+    python benchmarks/load_test.py --scale 1m --database-url postgresql://localhost/bench
+
+The client runs on the same machine and shares its CPUs with the server, so
+compare runs made on the same host with the same settings. SQLite
+serializes writers; use Postgres for write-heavy numbers.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+from dataset import BENCH_PASSWORD, CITIES_FILE, bench_email
+from api.commands import parse_count
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+SCENARIOS = ("location_page", "location_bbox", "user_get", "user_put", "login")
+# half the side of the location_bbox viewport, degrees
+BBOX_HALF_SIDE = 0.05
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", type=parse_count, default=parse_count("10k"),
+                        help="locations to seed: 10k, 100k, 1m, ...")
+    parser.add_argument("--users", type=parse_count, help="default: scale / 10")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--database-url",
+                        help="default: a SQLite file per scale and seed in the temp dir")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=3.0, help="seconds per scenario")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+    parser.add_argument("--threads", type=int, default=4, help="threads per worker")
+    parser.add_argument("--password-iterations", type=int,
+                        default=int(os.getenv("PASSWORD_HASH_ITERATIONS", 1_000_000)))
+    parser.add_argument("--output", type=Path)
+    return parser.parse_args()
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                               cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+    return commit, bool(dirty)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# ---------------------------------------------------------------------------
+# server
+# ---------------------------------------------------------------------------
+class Server:
+    def __init__(self, args, env):
+        self.port = free_port()
+        self.log = tempfile.NamedTemporaryFile(prefix="load_test_gunicorn_", suffix=".log",
+                                               delete=False)
+        # a private multiprocess dir: gunicorn.conf.py wipes it on start
+        env["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="load_test_prom_")
+        self.process = subprocess.Popen([
+            sys.executable, "-m", "gunicorn", "wsgi",
+            "--config", str(ROOT / "gunicorn.conf.py"), "--chdir", str(ROOT / "src"),
+            "--worker-class", "gthread", "--threads", str(args.threads),
+            "--workers", str(args.workers), "--bind", f"127.0.0.1:{self.port}",
+            "--log-level", "warning",
+        ], env=env, stdout=self.log, stderr=subprocess.STDOUT)
+
+    def wait_ready(self, timeout=120):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                break
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+                conn.request("GET", "/api/hello")
+                if conn.getresponse().status == 200:
+                    return
+            except OSError:
+                time.sleep(0.2)
+        self.stop()
+        raise SystemExit(f"gunicorn did not start, see {self.log.name}:\n"
+                         + Path(self.log.name).read_text()[-2000:])
+
+    def pids(self):
+        """The master and its workers, from /proc."""
+        pids = [self.process.pid]
+        try:
+            for task in Path(f"/proc/{self.process.pid}/task").iterdir():
+                pids += [int(pid) for pid in (task / "children").read_text().split()]
+        except OSError:
+            pass
+        return pids
+
+    def stop(self):
+        if self.process.poll() is None:
+            self.process.send_signal(signal.SIGTERM)
+            try:
+                self.process.wait(30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+class RssSampler(threading.Thread):
+    """Peak total RSS of the server processes since the last reset()."""
+
+    def __init__(self, server, interval=0.1):
+        super().__init__(daemon=True)
+        self.server = server
+        self.interval = interval
+        self.peak = None
+        self.overall = None
+        self.stopped = threading.Event()
+
+    def sample(self):
+        total = 0
+        for pid in self.server.pids():
+            try:
+                status = Path(f"/proc/{pid}/status").read_text()
+            except OSError:
+                continue
+            for line in status.splitlines():
+                if line.startswith("VmRSS:"):
+                    total += int(line.split()[1]) * 1024
+        return total or None
+
+    def reset(self):
+        self.peak = None
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            rss = self.sample()
+            if rss is not None:
+                self.peak = max(self.peak or 0, rss)
+                self.overall = max(self.overall or 0, rss)
+
+
+# ---------------------------------------------------------------------------
+# client
+# ---------------------------------------------------------------------------
+def call(port, method, path, body=None, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    conn.request(method, path, body=json.dumps(body) if body is not None else None,
+                 headers={"Content-Type": "application/json", **(headers or {})})
+    response = conn.getresponse()
+    data = response.read()
+    conn.close()
+    return response.status, json.loads(data) if data else None
+
+
+def login_pool(port, users, size):
+    """Tokens of `size` distinct users, logged in in parallel."""
+    indexes = random.Random(0).sample(range(users), min(size, users))
+    tokens = [None] * len(indexes)
+
+    def login(slot):
+        status, body = call(port, "POST", "/api/login",
+                            {"email": bench_email(indexes[slot]), "password": BENCH_PASSWORD})
+        if status != 201:
+            raise SystemExit(f"login failed with {status}: {body}")
+        tokens[slot] = body["token"]
+
+    threads = [threading.Thread(target=login, args=(slot,)) for slot in range(len(indexes))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if None in tokens:
+        raise SystemExit("could not log in the benchmark users")
+    return tokens
+
+
+def make_request(name, rng, ctx):
+    """(method, path, body, headers) of one request of scenario `name`."""
+    auth = {"Authorization": "Bearer " + rng.choice(ctx["tokens"])}
+    if name == "location_page":
+        return "GET", f"/api/location?limit=100&after={rng.randrange(ctx['locations'])}", None, {}
+    if name == "location_bbox":
+        city = rng.choice(ctx["cities"])["position"]
+        box = (city["lat"] - BBOX_HALF_SIDE, city["lng"] - BBOX_HALF_SIDE,
+               city["lat"] + BBOX_HALF_SIDE, city["lng"] + BBOX_HALF_SIDE)
+        return "GET", "/api/location?bbox=" + ",".join(f"{v:.5f}" for v in box), None, {}
+    if name == "user_get":
+        return "GET", "/api/user", None, auth
+    if name == "user_put":
+        return "PUT", "/api/user", {"zipcode": rng.randint(10000, 99999)}, auth
+    if name == "login":
+        return "POST", "/api/login", {"email": bench_email(rng.randrange(ctx["users"])),
+                                      "password": BENCH_PASSWORD}, {}
+    raise ValueError(f"unknown scenario {name}")
+
+
+def drive(port, name, ctx, concurrency, seconds, seed):
+    """Run `name` for `seconds`; returns (latencies in seconds, status counter)."""
+    latencies, statuses = [], Counter()
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client(index):
+        rng = random.Random(seed * 1000 + index)
+        local_latencies, local_statuses = [], Counter()
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        while time.perf_counter() < deadline:
+            method, path, body, headers = make_request(name, rng, ctx)
+            headers = {"Content-Type": "application/json", **headers}
+            start = time.perf_counter()
+            try:
+                conn.request(method, path, body=json.dumps(body) if body is not None else None,
+                             headers=headers)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException) as exc:
+                status = type(exc).__name__
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+            local_latencies.append(time.perf_counter() - start)
+            local_statuses[status] += 1
+        conn.close()
+        with lock:
+            latencies.extend(local_latencies)
+            statuses.update(local_statuses)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses
+
+
+def summarize(latencies, statuses, seconds, peak_rss):
+    latencies.sort()
+    ms = [value * 1000 for value in latencies]
+    errors = sum(count for status, count in statuses.items()
+                 if not isinstance(status, int) or status >= 400)
+    return {
+        "requests": len(ms),
+        "errors": errors,
+        "statuses": {str(key): value for key, value in sorted(statuses.items(), key=str)},
+        "throughput_rps": round(len(ms) / seconds, 1),
+        "latency_ms": {
+            "p50": round(percentile(ms, 50), 2),
+            "p95": round(percentile(ms, 95), 2),
+            "p99": round(percentile(ms, 99), 2),
+            "mean": round(statistics.fmean(ms), 2) if ms else 0.0,
+            "max": round(ms[-1], 2) if ms else 0.0,
+        },
+        "peak_rss_mb": round(peak_rss / 2**20, 1) if peak_rss else None,
+    }
+
+
+def main():
+    args = parse_args()
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    users = args.users if args.users is not None else max(1, args.scale // 10)
+    database_url = args.database_url or "sqlite:///" + str(
+        Path(tempfile.gettempdir()) / f"load_test_{args.scale}_{users}_{args.seed}.db")
+
+    env = dict(os.environ, DATABASE_URL=database_url,
+               PASSWORD_HASH_ITERATIONS=str(args.password_iterations),
+               FLASK_DEBUG="0", QUERY_DETECTOR="off")
+    env.setdefault("FLASK_APP_KEY", "bench")
+    print(f"seeding {args.scale} locations / {users} users ...", flush=True)
+    subprocess.run([sys.executable, str(Path(__file__).with_name("dataset.py")),
+                    "--database-url", database_url, "--locations", str(args.scale),
+                    "--users", str(users), "--seed", str(args.seed), "--skip-if-seeded"],
+                   env=env, check=True)
+
+    server = Server(args, env)
+    try:
+        server.wait_ready()
+        sampler = RssSampler(server)
+        sampler.start()
+        ctx = {
+            "tokens": login_pool(server.port, users, max(8, args.concurrency)),
+            "users": users,
+            "locations": args.scale,
+            "cities": json.loads(CITIES_FILE.read_text()),
+        }
+        results = {}
+        for index, name in enumerate(scenarios):
+            drive(server.port, name, ctx, args.concurrency, args.warmup, args.seed + index)
+            sampler.reset()
+            latencies, statuses = drive(server.port, name, ctx, args.concurrency,
+                                        args.duration, args.seed + index)
+            results[name] = summarize(latencies, statuses, args.duration, sampler.peak)
+            print(f"{name:<14} {results[name]['throughput_rps']:>8.1f} req/s  "
+                  f"p50 {results[name]['latency_ms']['p50']:>8.2f}  "
+                  f"p95 {results[name]['latency_ms']['p95']:>8.2f}  "
+                  f"p99 {results[name]['latency_ms']['p99']:>8.2f} ms  "
+                  f"errors {results[name]['errors']}", flush=True)
+        sampler.stopped.set()
+    finally:
+        server.stop()
+
+    commit, dirty = git_revision()
+    report = {
+        "meta": {
+            "commit": commit,
+            "dirty": dirty,
+            "created": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "database": database_url.split(":", 1)[0],
+            "locations": args.scale,
+            "users": users,
+            "seed": args.seed,
+            "workers": args.workers,
+            "threads": args.threads,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "password_iterations": args.password_iterations,
+        },
+        "peak_rss_mb": round(sampler.overall / 2**20, 1) if sampler.overall else None,
+        "scenarios": results,
+    }
+    output = args.output or RESULTS_DIR / f"{commit}{'-dirty' if dirty else ''}-{args.scale}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Hammer the API from many threads and check that no database connection is
+left checked out afterwards.
+
+The request mix covers plain reads, authenticated reads, like/unlike writes,
+validation errors, and streamed responses that the client abandons halfway
+(the path most likely to leak a session). Prints the pool counters from
+api.database and exits with status 1 if a connection leaked or a request
+failed with a 5xx.
+
+    python benchmarks/stress_db_pool.py --threads 32 --duration 20
+    python benchmarks/stress_db_pool.py --database-url postgresql://localhost/example
+
+DB_POOL_* variables apply as in the app. Without --database-url a
+throwaway SQLite file is used. A given database must be empty or already
+migrated; its tables are created if missing and the test rows are left in
+place.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--locations", type=int, default=200)
+    return parser.parse_args()
+
+
+args = parse_args()
+DB_PATH = Path(tempfile.gettempdir()) / "stress_db_pool.db"
+if args.database_url:
+    os.environ["DATABASE_URL"] = args.database_url
+else:
+    if DB_PATH.exists():
+        DB_PATH.unlink()
+    os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ.setdefault("FLASK_APP_KEY", "stress")
+# keep signups cheap, this measures the pool and not PBKDF2
+os.environ.setdefault("PASSWORD_HASH_ITERATIONS", "1000")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from app import app  # noqa: E402
+from api.models import db  # noqa: E402
+from api.database import pool_status  # noqa: E402
+
+
+def seed(client):
+    tokens = []
+    run_id = random.randrange(1 << 30)
+    for i in range(8):
+        res = client.post("/api/signup", json={
+            "email": f"stress-{run_id}-{i}@example.com", "password": "pw", "username": f"stress{i}"})
+        tokens.append(res.get_json()["token"])
+    for i in range(args.locations):
+        client.post("/api/location", json={
+            "name": f"Stress spot {i}", "type": random.choice(["fishing", "hunting"]),
+            "position": {"lat": random.uniform(25, 48), "lng": random.uniform(-124, -67)},
+            "directions": "n/a"})
+    return tokens
+
+
+def main():
+    with app.app_context():
+        db.create_all()
+        engine = db.engine
+    client = app.test_client()
+    tokens = seed(client)
+    location_ids = [row["id"] for row in client.get("/api/location").get_json()]
+
+    def abandoned_stream():
+        res = client.get("/api/location?stream=ndjson", buffered=False)
+        next(iter(res.response))
+        res.close()
+        return res.status_code
+
+    requests = [
+        lambda: client.get("/api/location?limit=50").status_code,
+        lambda: client.get("/api/location/top?limit=10").status_code,
+        lambda: client.get("/api/search?q=stress+spot").status_code,
+        lambda: client.get("/api/location?bbox=bad").status_code,
+        abandoned_stream,
+        lambda: client.get("/api/user", headers={
+            "Authorization": "Bearer " + random.choice(tokens)}).status_code,
+        lambda: client.open(f"/api/user/likes/{random.choice(location_ids)}",
+                            method=random.choice(["POST", "DELETE"]),
+                            headers={"Authorization": "Bearer " + random.choice(tokens)}).status_code,
+    ]
+
+    statuses = Counter()
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.duration
+
+    def worker():
+        local = Counter()
+        while time.monotonic() < deadline:
+            try:
+                local[random.choice(requests)()] += 1
+            except Exception as exc:
+                local[type(exc).__name__] += 1
+        with lock:
+            statuses.update(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    status = pool_status(engine)
+    total = sum(statuses.values())
+    print(json.dumps({
+        "requests": total,
+        "requests_per_sec": round(total / elapsed, 1),
+        "statuses": {str(key): value for key, value in sorted(statuses.items(), key=str)},
+        "pool": status,
+    }, indent=2))
+
+    failed = [key for key in statuses if not isinstance(key, int) or key >= 500]
+    if status["checked_out"] != 0:
+        print(f"LEAK: {status['checked_out']} connection(s) still checked out")
+    if failed:
+        print(f"FAILED: {failed}")
+    if not args.database_url:
+        DB_PATH.unlink()
+    sys.exit(1 if status["checked_out"] or failed else 0)
+
+
+if __name__ == "__main__":
+    main()
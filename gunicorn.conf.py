@@ -0,0 +1,27 @@
+"""
+gunicorn settings shared by the Procfile and render.yaml.
+
+Prepares a fresh PROMETHEUS_MULTIPROC_DIR before the workers fork so the
+/metrics endpoint (src/api/metrics.py) aggregates samples from every
+worker, and drops a worker's live samples when it exits.
+"""
+import os
+import shutil
+import tempfile
+
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR",
+                      os.path.join(tempfile.gettempdir(), "prometheus-multiproc"))
+
+
+def on_starting(server):
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,32 @@
+"""user change counter
+
+Revision ID: 3f6c2b9e1d47
+Revises: 1b8bfdfb6714
+Create Date: 2026-10-18 16:42:09.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6c2b9e1d47'
+down_revision = '1b8bfdfb6714'
+branch_labels = None
+depends_on = None
+
+change_counter = sa.table(
+    'change_counter',
+    sa.column('name', sa.String()),
+    sa.column('value', sa.BigInteger()),
+)
+
+
+def upgrade():
+    # bumped by every write to users, see api.sync; created here so
+    # concurrent first writers only ever UPDATE it
+    op.bulk_insert(change_counter, [{'name': 'user', 'value': 1}])
+
+
+def downgrade():
+    op.execute(change_counter.delete().where(change_counter.c.name == 'user'))
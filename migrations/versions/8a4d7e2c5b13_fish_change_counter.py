@@ -0,0 +1,31 @@
+"""fish change counter
+
+Revision ID: 8a4d7e2c5b13
+Revises: 3f6c2b9e1d47
+Create Date: 2026-10-18 17:20:51.604117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a4d7e2c5b13'
+down_revision = '3f6c2b9e1d47'
+branch_labels = None
+depends_on = None
+
+change_counter = sa.table(
+    'change_counter',
+    sa.column('name', sa.String()),
+    sa.column('value', sa.BigInteger()),
+)
+
+
+def upgrade():
+    # bumped by every write to fish, see api.sync and api.suggest
+    op.bulk_insert(change_counter, [{'name': 'fish', 'value': 1}])
+
+
+def downgrade():
+    op.execute(change_counter.delete().where(change_counter.c.name == 'fish'))
@@ -5,6 +5,18 @@ from .models import db, User, Location, Fish
 from flask_admin.contrib.sqla import ModelView
 
 
+class LocationView(ModelView):
+    # lat/lng/geohash are derived from position, edit position instead;
+    # version and like_count are maintained by api.sync / api.likes,
+    # source_key/content_hash by the seed commands
+    form_excluded_columns = ["lat", "lng", "geohash", "version", "like_count",
+                             "source_key", "content_hash"]
+
+
+class FishView(ModelView):
+    form_excluded_columns = ["source_key", "content_hash"]
+
+
 def setup_admin(app):
     app.secret_key = os.environ.get('FLASK_APP_KEY', 'sample key')
     app.config['FLASK_ADMIN_SWATCH'] = 'cerulean'
@@ -12,8 +24,8 @@ def setup_admin(app):
 
     # Add your models here, for example this is how we add a the User model to the admin
     admin.add_view(ModelView(User, db.session))
-    admin.add_view(ModelView(Location, db.session))
-    admin.add_view(ModelView(Fish, db.session))
+    admin.add_view(LocationView(Location, db.session))
+    admin.add_view(FishView(Fish, db.session))
 
     # You can duplicate that line to add mew models
     # admin.add_view(ModelView(YourModelName, db.session))
@@ -0,0 +1,284 @@
+"""
+In-process caches (API responses, authenticated identities) and
+conditional-request helpers.
+
+`data_version` is bumped after every committed write that touches locations,
+users or likes (see the session listeners at the bottom). Cache entries
+carry the version they were built at, so a bump invalidates all of them at
+once without hashing any payload.
+
+Writes made by *another* process (a second gunicorn worker, a `flask seed-*`
+run) are seen through the database instead: every write to those tables
+bumps change_counter["location"] or ["user"] (api.sync), and ETags and
+cache keys include both values, read with one primary-key SELECT per
+request. Tags are therefore the same on every worker and change as soon as
+any process commits. Cache entries also expire after a TTL.
+
+Under @replica_read the counters are read from the replica, like the body
+(replica_read must wrap these decorators), so a lagging replica never
+stores an old body under a new tag or cache key.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from functools import wraps
+
+from flask import g, request, make_response, Response
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from api.models import db, change_counter, User, Location
+from api.sync import LOCATION_COUNTER, USER_COUNTER
+
+# change_counter rows that cover the data behind the cached endpoints
+SHARED_COUNTERS = (LOCATION_COUNTER, USER_COUNTER)
+
+
+class DataVersion:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def bump(self):
+        with self._lock:
+            self.value += 1
+
+
+data_version = DataVersion()
+
+
+class VersionedCache:
+    def __init__(self, version, maxsize=256, ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._version = version
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                version, expires_at, value = entry
+                if version == self._version.value and expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value, version):
+        """Store value built from data at `version`.
+
+        Callers read the version *before* querying, so a write that commits
+        while the value is being built leaves a stale entry that is never served.
+        """
+        with self._lock:
+            if version != self._version.value:
+                return
+            self._entries[key] = (version, time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "version": self._version.value,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+# serialized GET /api/location payloads, one entry per query-string variant
+location_cache = VersionedCache(data_version)
+
+
+# ---------------------------------------------------------------------------
+# Identity cache: JWT subject -> the user's core columns, so authenticated
+# reads don't look the user up on every request. Entries are keyed on
+# change_counter["user"] (see shared_version), so a user write by any
+# process retires them; this process' own writes also drop them at once,
+# and they expire after a TTL.
+# ---------------------------------------------------------------------------
+CachedUser = namedtuple("CachedUser", ["id", "email", "user_name", "zipcode"])
+
+identity_version = DataVersion()
+identity_cache = VersionedCache(identity_version, maxsize=1024)
+
+
+def load_identity(user_id):
+    """Return the CachedUser for `user_id`, or None if there is no such user.
+
+    Costs the shared_version() read, which conditional_response has usually
+    made already.
+    """
+    key = (user_id, shared_version()[SHARED_COUNTERS.index(USER_COUNTER)])
+    user = identity_cache.get(key)
+    if user is None:
+        version = identity_version.value
+        row = db.session.execute(select(User.id, User.email, User.user_name, User.zipcode)
+                                 .where(User.id == user_id)).one_or_none()
+        if row is None:
+            return None
+        user = CachedUser(*row)
+        identity_cache.set(key, user, version)
+    return user
+
+
+def cached_response(cache):
+    """Serve a GET view's 200 responses from `cache`, keyed on the query string.
+
+    Streamed responses are passed through untouched.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if "stream" in request.args:
+                return view(*args, **kwargs)
+            key = (request.endpoint, tuple(sorted(request.args.items(multi=True))),
+                   shared_version())
+            cached = cache.get(key)
+            if cached is not None:
+                body, mimetype = cached
+                response = Response(body, status=200, mimetype=mimetype)
+                response.headers["X-Cache"] = "HIT"
+                return response
+
+            version = data_version.value
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                cache.set(key, (response.get_data(), response.mimetype), version)
+            response.headers["X-Cache"] = "MISS"
+            return response
+        return wrapper
+    return decorator
+
+
+# ---------------------------------------------------------------------------
+# Invalidation: bump the version after every commit that wrote location,
+# user or user_likes rows, whether through the unit of work (routes, admin
+# ModelView, seed commands) or a bulk insert/update/delete statement.
+# ---------------------------------------------------------------------------
+_TRACKED_MODELS = (User, Location)
+_TRACKED_TABLES = {"user", "location", "user_likes"}
+_DIRTY_FLAG = "location_cache_dirty"
+# set when users were updated or deleted (not inserted), for identity_cache
+_USERS_DIRTY_FLAG = "identity_cache_dirty"
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_dirty_on_flush(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, _TRACKED_MODELS):
+            session.info[_DIRTY_FLAG] = True
+            break
+    for obj in (*session.dirty, *session.deleted):
+        if isinstance(obj, User):
+            session.info[_USERS_DIRTY_FLAG] = True
+            break
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_dirty_on_bulk(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update
+            or orm_execute_state.is_delete):
+        return
+    table = getattr(orm_execute_state.statement, "table", None)
+    name = getattr(table, "name", None)
+    if name in _TRACKED_TABLES:
+        orm_execute_state.session.info[_DIRTY_FLAG] = True
+    if name == "user" and not orm_execute_state.is_insert:
+        orm_execute_state.session.info[_USERS_DIRTY_FLAG] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_on_commit(session):
+    if session.info.pop(_DIRTY_FLAG, False):
+        data_version.bump()
+    if session.info.pop(_USERS_DIRTY_FLAG, False):
+        identity_version.bump()
+
+
+@event.listens_for(Session, "after_rollback")
+def _clear_on_rollback(session):
+    session.info.pop(_DIRTY_FLAG, None)
+    session.info.pop(_USERS_DIRTY_FLAG, None)
+
+
+def shared_version():
+    """The SHARED_COUNTERS values as committed in the database, read once
+    per request from the bind the view reads from (the replica under
+    @replica_read). Changes whenever any process writes users, locations or likes."""
+    if "shared_version" not in g:
+        values = dict(db.session.execute(
+            select(change_counter.c.name, change_counter.c.value)
+            .where(change_counter.c.name.in_(SHARED_COUNTERS))).all())
+        g.shared_version = tuple(values.get(name, 0) for name in SHARED_COUNTERS)
+    return g.shared_version
+
+
+def _current_etag(scope):
+    raw = f"{shared_version()}:{scope!r}"
+    return hashlib.blake2b(raw.encode(), digest_size=12).hexdigest()
+
+
+# encodings api.compression may append to an ETag, see encoded_etag()
+ETAG_ENCODINGS = ("br", "gzip")
+
+
+def encoded_etag(etag, encoding):
+    """ETag of the `encoding`-compressed representation of `etag`'s body."""
+    return f"{etag}-{encoding}"
+
+
+def conditional_response(view):
+    """Add a strong ETag to a GET view's 200 responses and answer a matching
+    If-None-Match with 304 before the view (and the ORM) runs.
+
+    The tag is derived from shared_version(), the endpoint, the query string
+    and the JWT identity when there is one, never from the body.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if "stream" in request.args:
+            return view(*args, **kwargs)
+        try:
+            identity = get_jwt_identity()
+        except RuntimeError:
+            identity = None
+        etag = _current_etag((request.endpoint,
+                              tuple(sorted(request.args.items(multi=True))),
+                              identity))
+        for tag in (etag, *(encoded_etag(etag, enc) for enc in ETAG_ENCODINGS)):
+            if tag in request.if_none_match:
+                response = Response(status=304)
+                response.set_etag(tag)
+                return response
+
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200:
+            response.set_etag(etag)
+            # let clients keep the body but revalidate on every use
+            response.cache_control.no_cache = True
+        return response
+    return wrapper
+
+
+def setup_cache(app):
+    location_cache.maxsize = int(os.getenv("LOCATION_CACHE_SIZE", 256))
+    location_cache.ttl = float(os.getenv("LOCATION_CACHE_TTL", 30))
+    identity_cache.maxsize = int(os.getenv("IDENTITY_CACHE_SIZE", 1024))
+    identity_cache.ttl = float(os.getenv("IDENTITY_CACHE_TTL", 30))
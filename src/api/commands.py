@@ -1,8 +1,15 @@
 
 import click
+import hashlib
 import json
+import time
+from collections import Counter
+from contextlib import contextmanager
 from pathlib import Path
-from api.models import db, User, Fish
+from sqlalchemy import select, insert, update, delete, literal, Table, MetaData, Column, String
+from api.models import db, User, Fish, Location
+from api.geo import encode_geohash
+from api.ingest import batched, iter_records
 
 """
 In this file, you can add as many commands as you want using the @app.cli.command decorator
@@ -11,6 +18,385 @@ with youy database, for example: Import the price of bitcoin every night as 12am
 """
 
 
+# rows per multi-row INSERT / commit in the seed commands
+SEED_BATCH_SIZE = 1000
+
+# model column limits (keep in sync with models.py)
+NAME_MAX = 100
+LINK_MAX = 255
+
+# columns that make up each seeded row's content_hash
+FISH_HASH_FIELDS = ("name", "wiki_link", "image_link")
+CITY_HASH_FIELDS = ("name", "type", "position", "directions")
+
+
+class StageTimer:
+    """Accumulates wall time per named stage of a command."""
+
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def __call__(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def iterate(self, name, iterable):
+        """Yield from iterable, charging the time spent producing items to `name`."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add(name, time.perf_counter() - start)
+                return
+            self.add(name, time.perf_counter() - start)
+            yield item
+
+    def report(self, rows):
+        total = sum(self.stages.values())
+        for name, seconds in self.stages.items():
+            print(f"  {name:<10} {seconds:8.3f}s")
+        rate = rows / total if total else 0
+        print(f"  {'total':<10} {total:8.3f}s  ({rate:,.0f} rows/sec)")
+
+
+def _transform(records, to_row, stats, timer):
+    """Validate/normalize records into insertable dict rows, dropping the
+    ones to_row rejects (it returns None and counts why in `stats`)."""
+    for item in records:
+        start = time.perf_counter()
+        if isinstance(item, dict):
+            row = to_row(item, stats)
+        else:
+            stats["invalid"] += 1
+            row = None
+        timer.add("transform", time.perf_counter() - start)
+        if row is not None:
+            yield row
+
+
+def _drop_existing(table, batch, stats):
+    """Remove rows whose name is already in `table` or earlier in the batch.
+
+    Earlier batches are committed before the next one is checked, so this
+    also catches duplicates across the whole input without keeping every
+    name seen in memory.
+    """
+    unique = {}
+    for row in batch:
+        if row["name"] in unique:
+            stats["skipped"] += 1
+        else:
+            unique[row["name"]] = row
+    existing = set(db.session.scalars(
+        select(table.c.name).where(table.c.name.in_(list(unique)))))
+    stats["skipped"] += len(existing)
+    return [row for name, row in unique.items() if name not in existing]
+
+
+def _insert_rows(table, kind, rows, timer, stats, before_batch=None,
+                 batch_size=SEED_BATCH_SIZE):
+    """Insert an iterable of dict rows into `table` batch by batch: drop
+    names that already exist, run one multi-row INSERT ... RETURNING,
+    index the new rows for /api/search and commit.
+
+    `before_batch(batch)` may fill in per-batch columns before the insert.
+    A failing batch is retried row by row so one bad item does not sink
+    the rest. Counts go to stats["created"] / stats["failed"].
+    """
+    from api.search import index_rows
+
+    stmt = insert(table).returning(table.c.id, table.c.name,
+                                   sort_by_parameter_order=True)
+    for batch in batched(rows, batch_size):
+        try:
+            with timer("dedupe"):
+                batch = _drop_existing(table, batch, stats)
+            if not batch:
+                continue
+            with timer("insert"):
+                if before_batch:
+                    before_batch(batch)
+                inserted = db.session.execute(stmt, batch).all()
+            with timer("index"):
+                index_rows(db.session.connection(), kind, inserted)
+            with timer("commit"):
+                db.session.commit()
+            stats["created"] += len(inserted)
+        except Exception as e:
+            db.session.rollback()
+            print("Batch insert failed:", e)
+            # fallback: insert one by one to isolate the problem item
+            for one in batch:
+                try:
+                    if before_batch:
+                        before_batch([one])
+                    inserted = db.session.execute(stmt, [one]).all()
+                    index_rows(db.session.connection(), kind, inserted)
+                    db.session.commit()
+                    stats["created"] += 1
+                except Exception as e2:
+                    db.session.rollback()
+                    print("Skipping item due to error:", one.get("name"), e2)
+                    stats["failed"] += 1
+
+
+def _sync_rows(table, kind, rows, timer, stats, before_write=None,
+               before_delete=None, adopt_filter=None, batch_size=SEED_BATCH_SIZE):
+    """Make the seeded rows of `table` match `rows` in one transaction.
+
+    Rows are matched on source_key and compared by content_hash, so only
+    new or changed rows are written (one ON CONFLICT upsert per batch) and
+    seeded rows missing from the input are deleted. Rows without a
+    source_key (created through the API, or seeded before keys existed)
+    are left alone, except that a row with a matching name and no key is
+    adopted instead of inserting a duplicate; `adopt_filter` narrows which
+    rows qualify.
+
+    `before_write(rows)` may fill in per-batch columns and
+    `before_delete(ids_select)` clean up rows that reference the ones about
+    to be deleted. Counts go to stats created/updated/unchanged/deleted,
+    and to stats["duplicates"] for repeated keys: like _drop_existing, the
+    first occurrence in the input wins, later ones are ignored.
+    """
+    from api.search import index_rows, remove_rows
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    else:
+        raise click.ClickException(
+            f"--sync needs ON CONFLICT support (sqlite or postgresql), not {dialect}")
+
+    # keys seen in the input, kept in the database rather than in memory
+    seen = Table("seed_sync_seen", MetaData(),
+                 Column("source_key", String(120), primary_key=True),
+                 prefixes=["TEMPORARY"])
+    seen.create(db.session.connection())
+
+    for batch in batched(rows, batch_size):
+        with timer("diff"):
+            unique = {}
+            for row in batch:
+                unique.setdefault(row["source_key"], row)
+            # keys already written by an earlier batch
+            earlier = set(db.session.scalars(select(seen.c.source_key)
+                                             .where(seen.c.source_key.in_(list(unique)))))
+            unique = {key: row for key, row in unique.items() if key not in earlier}
+            stats["duplicates"] += len(batch) - len(unique)
+            if not unique:
+                continue
+            keys = list(unique)
+            db.session.execute(upsert(seen).on_conflict_do_nothing(),
+                               [{"source_key": key} for key in keys])
+            existing = dict(db.session.execute(
+                select(table.c.source_key, table.c.content_hash)
+                .where(table.c.source_key.in_(keys))).all())
+            adoptable = {}
+            missing = [key for key in keys if key not in existing]
+            if missing:
+                stmt = select(table.c.name, table.c.id).where(
+                    table.c.source_key.is_(None), table.c.name.in_(missing))
+                if adopt_filter is not None:
+                    stmt = stmt.where(adopt_filter)
+                for name, row_id in db.session.execute(stmt.order_by(table.c.id)):
+                    adoptable.setdefault(name, row_id)
+
+            upserts = []
+            adopted = []
+            created = []
+            for key, row in unique.items():
+                if key in existing:
+                    if existing[key] == row["content_hash"]:
+                        stats["unchanged"] += 1
+                        continue
+                    stats["updated"] += 1
+                    upserts.append(row)
+                elif row["name"] in adoptable:
+                    stats["updated"] += 1
+                    adopted.append((adoptable[row["name"]], row))
+                else:
+                    stats["created"] += 1
+                    upserts.append(row)
+                    created.append(key)
+        if not upserts and not adopted:
+            continue
+
+        with timer("write"):
+            if before_write:
+                before_write(upserts + [row for _, row in adopted])
+            if upserts:
+                stmt = upsert(table)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[table.c.source_key],
+                    set_={col: stmt.excluded[col] for col in upserts[0]
+                          if col != "source_key"},
+                    where=table.c.content_hash != stmt.excluded.content_hash)
+                db.session.execute(stmt, upserts)
+            for row_id, row in adopted:
+                db.session.execute(update(table).where(
+                    table.c.id == row_id).values(**row))
+
+        # the key is the name, so only new rows need indexing
+        if created:
+            with timer("index"):
+                written = db.session.execute(
+                    select(table.c.id, table.c.name)
+                    .where(table.c.source_key.in_(created))).all()
+                index_rows(db.session.connection(), kind, written)
+
+    with timer("delete"):
+        doomed = select(table.c.id).where(
+            table.c.source_key.isnot(None),
+            table.c.source_key.notin_(select(seen.c.source_key)))
+        doomed_ids = db.session.scalars(doomed).all()
+        if doomed_ids:
+            if before_delete:
+                before_delete(doomed)
+            for chunk in batched(doomed_ids, batch_size):
+                remove_rows(db.session.connection(), kind, chunk)
+            db.session.execute(delete(table).where(table.c.id.in_(doomed)))
+        stats["deleted"] += len(doomed_ids)
+
+    with timer("commit"):
+        seen.drop(db.session.connection())
+        db.session.commit()
+
+
+def _content_hash(row, fields):
+    payload = json.dumps([row[field] for field in fields],
+                         sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _fish_row(item, stats):
+    name = item.get("name")
+    wiki_link = item.get("url")
+    # try to pick a sensible image: prefer 2x then 1.5x then any
+    image_link = None
+    img_src_set = item.get("img_src_set") or {}
+    if isinstance(img_src_set, dict):
+        image_link = img_src_set.get("2x") or img_src_set.get("1.5x")
+        if not image_link:
+            # fallback to first available
+            vals = list(img_src_set.values())
+            if vals:
+                image_link = vals[0]
+
+    # skip items without a name
+    if not name:
+        stats["skipped_no_name"] += 1
+        return None
+
+    # sanitize / truncate to model limits
+    if isinstance(name, str) and len(name) > NAME_MAX:
+        name = name[:NAME_MAX]
+        stats["truncated"] += 1
+    if isinstance(wiki_link, str) and len(wiki_link) > LINK_MAX:
+        wiki_link = wiki_link[:LINK_MAX]
+        stats["truncated"] += 1
+    if isinstance(image_link, str) and len(image_link) > LINK_MAX:
+        image_link = image_link[:LINK_MAX]
+        stats["truncated"] += 1
+
+    row = {"name": name, "wiki_link": wiki_link, "image_link": image_link,
+           "source_key": name}
+    row["content_hash"] = _content_hash(row, FISH_HASH_FIELDS)
+    return row
+
+
+def _city_row(item, stats):
+    name = item.get("name")
+    position = item.get("position") or {}
+    directions = item.get("directions")
+    type_ = item.get("type") or "fishing"
+
+    # required checks
+    if not name:
+        stats["skipped_no_name"] += 1
+        return None
+
+    try:
+        lat = float(position.get("lat"))
+        lng = float(position.get("lng"))
+    except Exception:
+        stats["invalid_position"] += 1
+        return None
+
+    # normalize type
+    if type_ not in {"fishing", "hunting"}:
+        type_ = "fishing"
+
+    # sanitize / truncate to model limits
+    name = name.strip()[:NAME_MAX]
+    if isinstance(directions, str) and len(directions) > LINK_MAX:
+        directions = directions[:LINK_MAX]
+
+    # bulk inserts bypass Location._sync_coordinates, so fill the derived
+    # columns here
+    row = {
+        "name": name,
+        "type": type_,
+        "position": {"lat": lat, "lng": lng},
+        "lat": lat,
+        "lng": lng,
+        "geohash": encode_geohash(lat, lng),
+        "directions": directions or None,
+        "source_key": name,
+    }
+    row["content_hash"] = _content_hash(row, CITY_HASH_FIELDS)
+    return row
+
+
+def parse_count(value):
+    """"10k" -> 10000, "2m" -> 2000000, "2500" -> 2500. Raises ValueError
+    for anything else, including negative counts (also used by benchmarks/)."""
+    text = str(value).strip().lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    count = int(float(text.rstrip("km")) * scale)
+    if count < 0:
+        raise ValueError(f"{value!r} is negative")
+    return count
+
+
+def _parse_count(ctx, param, value):
+    """Click callback for parse_count()."""
+    try:
+        return parse_count(value)
+    except ValueError:
+        raise click.BadParameter(f"{value!r} is not a count like 5000, 10k or 1m")
+
+
+def _run_generate(users, locations, seed=1, password="password",
+                  cities=Path("src/data/usa-cities-geo.json"), batch_size=None, workers=1):
+    from api.generate import GENERATE_BATCH_SIZE, generate, load_cities
+
+    if not cities.exists():
+        raise click.ClickException(f"File not found: {cities}")
+    timer = StageTimer()
+    with timer("read"):
+        city_rows = load_cities(cities)
+    print(f"Generating {users:,} users and {locations:,} locations (seed {seed})...")
+    try:
+        counts = generate(timer, users, locations, city_rows, seed=seed, password=password,
+                          batch_size=batch_size or GENERATE_BATCH_SIZE, workers=workers)
+    except Exception:
+        db.session.rollback()
+        raise
+    print(", ".join(f"{count:,} {name.replace('_', ' ')}" for name, count in counts.items()))
+    timer.report(sum(counts.values()))
+
+
 def setup_commands(app):
     """ 
     This is an example command "insert-test-users" that you can run from the command line
@@ -20,39 +406,133 @@ def setup_commands(app):
     @app.cli.command("insert-test-users")  # name of our command
     @click.argument("count")  # argument of out command
     def insert_test_users(count):
+        from api.passwords import password_hasher
+
         print("Creating test users")
+        # every user gets the same password, hash it once
+        password_hash = password_hasher.hash("123456")
         for x in range(1, int(count) + 1):
             user = User()
             user.email = "test_user" + str(x) + "@test.com"
-            user.password = "123456"
-            user.is_active = True
+            user.user_name = "test_user" + str(x)
+            user.password = password_hash
             db.session.add(user)
-            db.session.commit()
             print("User: ", user.email, " created.")
+        db.session.commit()
 
         print("All test users created")
 
     @app.cli.command("insert-test-data")
-    def insert_test_data():
-        pass
+    @click.option("--seed", default=1, show_default=True)
+    def insert_test_data(seed):
+        """Add a small generated dataset (10 users, 200 locations, likes).
+
+        Every user's password is "password"; see generate-data for more.
+        """
+        _run_generate(users=10, locations=200, seed=seed)
+
+    @app.cli.command("generate-data")
+    @click.option("--users", default="1k", callback=_parse_count, show_default=True,
+                  help="Users to create, e.g. 5000, 100k, 2m")
+    @click.option("--locations", default="10k", callback=_parse_count, show_default=True,
+                  help="Locations to create, e.g. 10k, 1m")
+    @click.option("--seed", default=1, show_default=True, help="Same seed, same rows")
+    @click.option("--password", default="password", show_default=True,
+                  help="Password of every generated user")
+    @click.option("--cities", default="src/data/usa-cities-geo.json", show_default=True,
+                  help="Cities JSON array (name, position) to cluster locations around")
+    @click.option("--batch-size", default=10000, show_default=True, help="Rows per bulk write")
+    @click.option("--workers", default=1, help="Processes used to generate locations")
+    def generate_data(users, locations, seed, password, cities, batch_size, workers):
+        """Bulk-create synthetic users, locations and likes for load testing.
+
+        Locations are scattered around the cities file (bigger cities get
+        more), likes follow a power law, and like_count, version, geohash
+        and the search index are filled in. Users are
+        generated-<id>@example.com. Rows are appended in one transaction.
+        """
+        _run_generate(users, locations, seed, password, Path(cities), batch_size, workers)
+
+    @app.cli.command("rebuild-search-index")
+    @click.option("--kind", type=click.Choice(["location", "fish", "all"]), default="all")
+    def rebuild_search_index(kind):
+        """Rebuild the /api/search token index from the Location/Fish tables."""
+        from api.search import SEARCH_MODELS, rebuild_index
+
+        kinds = list(SEARCH_MODELS) if kind == "all" else [kind]
+        for one in kinds:
+            total = rebuild_index(one)
+            db.session.commit()
+            print(f"Indexed {total} {one} rows")
+
+    @app.cli.command("recount-likes")
+    def recount_likes_command():
+        """Recompute Location.like_count from user_likes where it drifted."""
+        from api.likes import recount_likes
+        from api.sync import stamp_locations
+
+        fixed = recount_likes(db.session)
+        stamp_locations(db.session, fixed)
+        db.session.commit()
+        print(f"Fixed like_count on {len(fixed)} locations")
+
+    @app.cli.command("list-profiles")
+    @click.option("--limit", default=20, show_default=True, help="Number of profiles to list, newest first")
+    @click.option("--show", "show_id", default=None, help="Print the SQL timeline and call tree of one profile")
+    def list_profiles_command(limit, show_id):
+        """List request profiles captured with the X-Profile header."""
+        from api.profiling import list_profiles, profile_dir
+
+        profiles = list_profiles()
+        if show_id:
+            found = [p for p in profiles if p["id"] == show_id]
+            if not found:
+                raise click.ClickException(f"No profile {show_id} in {profile_dir()}")
+            profile = found[0]
+            print(f"{profile['method']} {profile['path']} -> {profile['status']}  "
+                  f"{profile['duration_ms']:.1f} ms, {profile['sql_count']} statements "
+                  f"in {profile['sql_ms']:.1f} ms")
+            for statement in profile["sql"]:
+                print(f"  +{statement['offset_ms']:>9.1f} ms {statement['duration_ms']:>8.1f} ms  "
+                      f"{' '.join(statement['statement'].split())[:120]}")
+            print(profile["summary"])
+            print(f"cProfile data: {profile_dir() / (profile['id'] + '.prof')}")
+            return
+
+        print(f"{len(profiles)} profiles in {profile_dir()}")
+        for profile in profiles[:limit]:
+            print(f"{profile['id']}  {profile['method']:<6} {profile['path']:<30} "
+                  f"{profile['status']:>3}  {profile['duration_ms']:>9.1f} ms  "
+                  f"{profile['sql_count']:>4} sql / {profile['sql_ms']:.1f} ms")
 
     @app.cli.command("seed-fish")
-    @click.option("--file", default="src/data/all-fish-species.json", help="Path to fish JSON file")
+    @click.option("--file", default="src/data/all-fish-species.json", help="Path to fish JSON array or NDJSON (.ndjson/.jsonl) file")
     @click.option("--clear", is_flag=True, default=False, help="If set, clears existing Fish rows before seeding")
-    def seed_fish(file, clear):
+    @click.option("--sync", is_flag=True, default=False, help="Upsert changed rows and delete seeded rows missing from the file")
+    @click.option("--workers", default=1, help="Processes used to parse NDJSON input")
+    @click.option("--batch-size", default=SEED_BATCH_SIZE, help="Rows per INSERT/commit")
+    def seed_fish(file, clear, sync, workers, batch_size):
         """Seed the Fish table from a JSON file.
 
+        The file is streamed through parse -> validate/truncate -> dedupe ->
+        batched insert, so memory stays flat whatever its size.
         By default this will skip fish that already exist (matched by name).
-        Use --clear to delete all existing Fish rows first.
+        Use --clear to delete all existing Fish rows first, or --sync to make
+        the seeded rows match the file (see _sync_rows).
         """
         data_path = Path(file)
         if not data_path.exists():
             print(f"File not found: {data_path}")
             return
+        if clear and sync:
+            raise click.UsageError("--clear and --sync are mutually exclusive")
 
         if clear:
             print("Clearing existing Fish rows...")
             try:
+                from api.models import SearchToken
+                db.session.execute(delete(SearchToken).where(
+                    SearchToken.kind == "fish"))
                 num = db.session.query(Fish).delete()
                 db.session.commit()
                 print(f"Deleted {num} Fish rows")
@@ -61,123 +541,65 @@ def setup_commands(app):
                 print("Failed to clear Fish rows:", e)
                 return
 
+        timer = StageTimer()
+        stats = Counter()
         print(f"Loading fish from {data_path}")
-        with data_path.open("r", encoding="utf-8") as f:
-            items = json.load(f)
-
-        created = 0
-        skipped = 0
-        skipped_no_name = 0
-        truncated = 0
-        to_add = []
-
-        # model column limits (keep in sync with models.py)
-        NAME_MAX = 100
-        LINK_MAX = 255
-
-        for item in items:
-            name = item.get("name")
-            wiki_link = item.get("url")
-            # try to pick a sensible image: prefer 2x then 1.5x then any
-            image_link = None
-            img_src_set = item.get("img_src_set") or {}
-            if isinstance(img_src_set, dict):
-                image_link = img_src_set.get("2x") or img_src_set.get("1.5x")
-                if not image_link:
-                    # fallback to first available
-                    vals = list(img_src_set.values())
-                    if vals:
-                        image_link = vals[0]
-
-            # skip items without a name
-            if not name:
-                skipped_no_name += 1
-                continue
-
-            # sanitize / truncate to model limits
-            if isinstance(name, str) and len(name) > NAME_MAX:
-                name = name[:NAME_MAX]
-                truncated += 1
-            if isinstance(wiki_link, str) and len(wiki_link) > LINK_MAX:
-                wiki_link = wiki_link[:LINK_MAX]
-                truncated += 1
-            if isinstance(image_link, str) and len(image_link) > LINK_MAX:
-                image_link = image_link[:LINK_MAX]
-                truncated += 1
-
-            # skip if a Fish with same name exists
-            if db.session.query(Fish).filter_by(name=name).first():
-                skipped += 1
-                continue
-
-            fish = Fish(name=name, wiki_link=wiki_link, image_link=image_link)
-            to_add.append(fish)
-
-            # batch commit every 500 items to avoid large transactions
-            if len(to_add) >= 500:
-                try:
-                    db.session.add_all(to_add)
-                    db.session.commit()
-                    created += len(to_add)
-                except Exception as e:
-                    db.session.rollback()
-                    print("Batch commit failed:", e)
-                    # fallback: try inserting one by one to isolate problem item
-                    for one in to_add:
-                        try:
-                            db.session.add(one)
-                            db.session.commit()
-                            created += 1
-                        except Exception as e2:
-                            db.session.rollback()
-                            print("Skipping item due to error:",
-                                  getattr(one, 'name', None), e2)
-                            skipped += 1
-                to_add = []
-
-        if to_add:
-            try:
-                db.session.add_all(to_add)
-                db.session.commit()
-                created += len(to_add)
-            except Exception as e:
-                db.session.rollback()
-                print("Final batch commit failed:", e)
-                for one in to_add:
-                    try:
-                        db.session.add(one)
-                        db.session.commit()
-                        created += 1
-                    except Exception as e2:
-                        db.session.rollback()
-                        print("Skipping item due to error:",
-                              getattr(one, 'name', None), e2)
-                        skipped += 1
+        records = timer.iterate("parse", iter_records(data_path, workers=workers))
+        rows = _transform(records, _fish_row, stats, timer)
+        if sync:
+            _sync_rows(Fish.__table__, "fish", rows, timer, stats,
+                       batch_size=batch_size)
+            print(
+                f"Sync complete. Created: {stats['created']}, Updated: {stats['updated']}, Unchanged: {stats['unchanged']}, Deleted: {stats['deleted']}, Duplicates: {stats['duplicates']}, Skipped (no name): {stats['skipped_no_name']}, Invalid: {stats['invalid']}, Truncated fields: {stats['truncated']}")
+            timer.report(stats["created"] + stats["updated"] + stats["unchanged"])
+            return
+        _insert_rows(Fish.__table__, "fish", rows, timer, stats,
+                     batch_size=batch_size)
 
         print(
-            f"Seeding complete. Created: {created}, Skipped (existing): {skipped}, Skipped (no name): {skipped_no_name}, Truncated fields: {truncated}")
+            f"Seeding complete. Created: {stats['created']}, Skipped (existing): {stats['skipped']}, Skipped (no name): {stats['skipped_no_name']}, Invalid: {stats['invalid']}, Failed: {stats['failed']}, Truncated fields: {stats['truncated']}")
+        timer.report(stats["created"])
 
     @app.cli.command("seed-cities")
-    @click.option("--file", default="src/data/usa-cities-geo.json", help="Path to cities JSON file")
+    @click.option("--file", default="src/data/usa-cities-geo.json", help="Path to cities JSON array or NDJSON (.ndjson/.jsonl) file")
     @click.option("--clear", is_flag=True, default=False, help="If set, clears existing Location rows before seeding")
-    def seed_cities(file, clear):
+    @click.option("--sync", is_flag=True, default=False, help="Upsert changed rows and delete seeded rows missing from the file")
+    @click.option("--workers", default=1, help="Processes used to parse NDJSON input")
+    @click.option("--batch-size", default=SEED_BATCH_SIZE, help="Rows per INSERT/commit")
+    def seed_cities(file, clear, sync, workers, batch_size):
         """Seed the Location table from a cities JSON file.
 
         The JSON should be an array of objects with at least: name, position {lat,lng}, type, directions.
+        The file is streamed like in seed-fish.
         By default this will skip locations that already exist (matched by name).
-        Use --clear to delete all existing Location rows first.
+        Use --clear to delete all existing Location rows first, or --sync to
+        make the seeded rows match the file. --sync never touches locations
+        created by users.
         """
         data_path = Path(file)
         if not data_path.exists():
             print(f"File not found: {data_path}")
             return
+        if clear and sync:
+            raise click.UsageError("--clear and --sync are mutually exclusive")
 
-        # import Location model here to avoid circular import at module load
-        from api.models import Location
+        from api.models import LocationTombstone, SearchToken, user_likes
+        from api.sync import next_change_version
 
         if clear:
             print("Clearing existing Location rows...")
             try:
+                # bulk deletes skip the ORM events, so leave the tombstones
+                # for delta syncs (api.sync) by hand
+                version = next_change_version(db.session)
+                db.session.execute(delete(LocationTombstone).where(
+                    LocationTombstone.location_id.in_(select(Location.id))))
+                db.session.execute(insert(LocationTombstone).from_select(
+                    ["location_id", "version"],
+                    select(Location.id, literal(version))))
+                db.session.execute(delete(user_likes))
+                db.session.execute(delete(SearchToken).where(
+                    SearchToken.kind == "location"))
                 num = db.session.query(Location).delete()
                 db.session.commit()
                 print(f"Deleted {num} Location rows")
@@ -186,90 +608,40 @@ def setup_commands(app):
                 print("Failed to clear Location rows:", e)
                 return
 
-        print(f"Loading cities from {data_path}")
-        with data_path.open("r", encoding="utf-8") as f:
-            items = json.load(f)
-
-        created = 0
-        skipped = 0
-        skipped_no_name = 0
-        invalid_position = 0
-        to_add = []
-
-        for item in items:
-            name = item.get("name")
-            position = item.get("position") or {}
-            directions = item.get("directions")
-            type_ = item.get("type") or "fishing"
-
-            # required checks
-            if not name:
-                skipped_no_name += 1
-                continue
+        def stamp_version(batch):
+            # one change version per committed batch keeps delta syncs ordered
+            version = next_change_version(db.session)
+            for row in batch:
+                row["version"] = version
 
-            try:
-                lat = float(position.get("lat"))
-                lng = float(position.get("lng"))
-            except Exception:
-                invalid_position += 1
-                continue
-
-            # normalize type
-            if type_ not in {"fishing", "hunting"}:
-                type_ = "fishing"
-
-            # skip if a Location with same name exists
-            if db.session.query(Location).filter_by(name=name).first():
-                skipped += 1
-                continue
-
-            loc = Location(
-                name=name.strip(),
-                type=type_,
-                position={"lat": lat, "lng": lng},
-                directions=(directions or None),
-            )
-            to_add.append(loc)
-
-            # batch commit every 500 items
-            if len(to_add) >= 500:
-                try:
-                    db.session.add_all(to_add)
-                    db.session.commit()
-                    created += len(to_add)
-                except Exception as e:
-                    db.session.rollback()
-                    print("Batch commit failed:", e)
-                    for one in to_add:
-                        try:
-                            db.session.add(one)
-                            db.session.commit()
-                            created += 1
-                        except Exception as e2:
-                            db.session.rollback()
-                            print("Skipping item due to error:",
-                                  getattr(one, 'name', None), e2)
-                            skipped += 1
-                to_add = []
-
-        if to_add:
-            try:
-                db.session.add_all(to_add)
-                db.session.commit()
-                created += len(to_add)
-            except Exception as e:
-                db.session.rollback()
-                print("Final batch commit failed:", e)
-                for one in to_add:
-                    try:
-                        db.session.add(one)
-                        db.session.commit()
-                        created += 1
-                    except Exception as e2:
-                        db.session.rollback()
-                        print("Skipping item due to error:",
-                              getattr(one, 'name', None), e2)
-                        skipped += 1
+        timer = StageTimer()
+        stats = Counter()
+        print(f"Loading cities from {data_path}")
+        records = timer.iterate("parse", iter_records(data_path, workers=workers))
+        rows = _transform(records, _city_row, stats, timer)
+        if sync:
+            def tombstone(doomed_ids):
+                version = next_change_version(db.session)
+                db.session.execute(delete(LocationTombstone).where(
+                    LocationTombstone.location_id.in_(doomed_ids)))
+                db.session.execute(insert(LocationTombstone).from_select(
+                    ["location_id", "version"],
+                    select(Location.id, literal(version))
+                    .where(Location.id.in_(doomed_ids))))
+                db.session.execute(delete(user_likes).where(
+                    user_likes.c.location_id.in_(doomed_ids)))
+
+            _sync_rows(Location.__table__, "location", rows, timer, stats,
+                       before_write=stamp_version, before_delete=tombstone,
+                       adopt_filter=Location.creator_id.is_(None),
+                       batch_size=batch_size)
+            print(
+                f"Sync complete. Created: {stats['created']}, Updated: {stats['updated']}, Unchanged: {stats['unchanged']}, Deleted: {stats['deleted']}, Duplicates: {stats['duplicates']}, Skipped (no name): {stats['skipped_no_name']}, Invalid positions: {stats['invalid_position']}, Invalid: {stats['invalid']}")
+            timer.report(stats["created"] + stats["updated"] + stats["unchanged"])
+            return
+        _insert_rows(Location.__table__, "location", rows, timer, stats,
+                     before_batch=stamp_version, batch_size=batch_size)
 
         print(
-            f"Seeding complete. Created: {created}, Skipped (existing): {skipped}, Skipped (no name): {skipped_no_name}, Invalid positions: {invalid_position}")
+            f"Seeding complete. Created: {stats['created']}, Skipped (existing): {stats['skipped']}, Skipped (no name): {stats['skipped_no_name']}, Invalid positions: {stats['invalid_position']}, Invalid: {stats['invalid']}, Failed: {stats['failed']}")
+        timer.report(stats["created"])
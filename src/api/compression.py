@@ -0,0 +1,96 @@
+"""
+gzip / brotli compression of API responses, negotiated from Accept-Encoding.
+
+Only complete (not streamed) 200 responses with a compressible mimetype and
+at least COMPRESS_MIN_SIZE bytes are compressed; static files are left to
+the front-end build. Brotli is used when the client accepts it and the
+`brotli` package is installed. Responses that carry an ETag (see
+api.cache.conditional_response) are compressed once per ETag and encoding
+and then served from an LRU cache; their ETag gets the encoding appended so
+each representation has its own strong validator.
+
+    COMPRESS_MIN_SIZE     smallest body worth compressing, bytes (1024)
+    COMPRESS_GZIP_LEVEL   1-9 (6)
+    COMPRESS_BR_QUALITY   0-11 (4, brotli's higher levels are too slow per request)
+    COMPRESS_CACHE_SIZE   compressed bodies kept (64)
+"""
+import gzip
+import os
+
+from flask import request
+
+from api.cache import DataVersion, VersionedCache, encoded_etag
+
+try:
+    import brotli
+except ImportError:  # optional, see Pipfile
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "image/svg+xml",
+}
+
+
+class Compressor:
+    def __init__(self, min_size=1024, gzip_level=6, br_quality=4, cache_size=64):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.br_quality = br_quality
+        # entries are keyed on the ETag, which already changes with the data,
+        # so the version is never bumped
+        self.cache = VersionedCache(DataVersion(), maxsize=cache_size, ttl=3600)
+
+    def encodings(self):
+        return ("br", "gzip") if brotli is not None else ("gzip",)
+
+    def compress(self, data, encoding):
+        if encoding == "br":
+            return brotli.compress(data, quality=self.br_quality)
+        return gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+
+    def process(self, response):
+        if response.status_code == 304:
+            if response.mimetype in COMPRESSIBLE_MIMETYPES or \
+                    response.headers.get("ETag"):
+                response.vary.add("Accept-Encoding")
+            return response
+        if response.status_code != 200 or response.direct_passthrough \
+                or response.is_streamed or "Content-Encoding" in response.headers:
+            return response
+        if not (response.mimetype in COMPRESSIBLE_MIMETYPES
+                or response.mimetype.startswith("text/")):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        if (response.content_length or 0) < self.min_size:
+            return response
+        encoding = request.accept_encodings.best_match(self.encodings())
+        if encoding is None:
+            return response
+
+        etag, weak = response.get_etag()
+        key = (etag, encoding) if etag and not weak else None
+        body = self.cache.get(key) if key else None
+        if body is None:
+            body = self.compress(response.get_data(), encoding)
+            if key:
+                self.cache.set(key, body, 0)
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+        if key:
+            response.set_etag(encoded_etag(etag, encoding))
+        return response
+
+
+compressor = Compressor()
+
+
+def setup_compression(app):
+    compressor.min_size = int(os.getenv("COMPRESS_MIN_SIZE", 1024))
+    compressor.gzip_level = int(os.getenv("COMPRESS_GZIP_LEVEL", 6))
+    compressor.br_quality = int(os.getenv("COMPRESS_BR_QUALITY", 4))
+    compressor.cache.maxsize = int(os.getenv("COMPRESS_CACHE_SIZE", 64))
+    app.after_request(compressor.process)
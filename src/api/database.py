@@ -0,0 +1,158 @@
+"""
+Engine/pool configuration read from the environment, plus pool metrics.
+
+    DB_POOL_SIZE               connections kept open per process (5)
+    DB_MAX_OVERFLOW            extra connections allowed under load (10)
+    DB_POOL_TIMEOUT            seconds to wait for a free connection (30)
+    DB_POOL_RECYCLE            reconnect connections older than this, seconds (1800)
+    DB_POOL_PRE_PING           test connections on checkout, 1/0 (1)
+    DB_STATEMENT_TIMEOUT_MS    per-statement limit on Postgres, 0 = none (0)
+
+Pool sizes are per process: with gunicorn, multiply by the number of
+workers and keep the total under the database's max_connections.
+"""
+import os
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.checked_out = 0
+            self.peak_checked_out = 0
+            self.wait_seconds = 0.0
+            self.max_wait_seconds = 0.0
+            self.timeouts = 0
+            self.connects = 0
+            self.invalidations = 0
+
+    def record_wait(self, seconds, timed_out=False):
+        with self._lock:
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def checkout(self):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+
+    def checkin(self):
+        with self._lock:
+            self.checked_out -= 1
+
+    def count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checked_out": self.checked_out,
+                "peak_checked_out": self.peak_checked_out,
+                "wait_seconds_total": round(self.wait_seconds, 6),
+                "wait_seconds_max": round(self.max_wait_seconds, 6),
+                "timeouts": self.timeouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+            }
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that keeps its own PoolStats in `stats`.
+
+    Checkout waits are timed here; checkouts, checkins, connects and
+    invalidations are counted by listeners on the pool instance.
+    """
+
+    def __init__(self, *args, **kwargs):
+        # recreate() (engine.dispose(), invalidation of the whole pool)
+        # copies the instance listeners through _dispatch and shares stats
+        recreated = kwargs.get("_dispatch") is not None
+        super().__init__(*args, **kwargs)
+        if not recreated:
+            self.stats = PoolStats()
+            _listen(self, self.stats)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        self.stats.record_wait(time.perf_counter() - start)
+        return conn
+
+
+def _env_bool(name, default):
+    return os.getenv(name, "1" if default else "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+def engine_options(database_url):
+    """SQLALCHEMY_ENGINE_OPTIONS for `database_url` from the DB_* variables."""
+    if database_url.startswith("sqlite") and ":memory:" in database_url:
+        # one shared connection, there is no pool to size
+        return {}
+    options = {
+        "poolclass": TimedQueuePool,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", 5)),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 10)),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", 30)),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+    }
+    timeout_ms = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 0))
+    if timeout_ms and database_url.startswith("postgresql"):
+        options["connect_args"] = {"options": f"-c statement_timeout={timeout_ms}"}
+    return options
+
+
+def pool_status(engine):
+    """Counters and current sizes of `engine`'s pool, {} if it is not a TimedQueuePool."""
+    pool = engine.pool
+    if not isinstance(pool, TimedQueuePool):
+        return {}
+    status = pool.stats.as_dict()
+    status.update({
+        "pool_size": pool.size(),
+        "overflow": pool.overflow(),
+        "idle": pool.checkedin(),
+    })
+    return status
+
+
+def _listen(pool, stats):
+    @event.listens_for(pool, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        stats.count("connects")
+
+    @event.listens_for(pool, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.checkout()
+
+    @event.listens_for(pool, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        stats.checkin()
+
+    @event.listens_for(pool, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        stats.count("invalidations")
@@ -0,0 +1,292 @@
+"""
+Synthetic data for load testing, see `flask generate-data`.
+
+Users, locations clustered around the cities of a cities JSON file
+(gaussian jitter, bigger cities get more of them) and likes with a
+power-law distribution (most users like a handful of locations, a few like
+hundreds, and a few locations collect most of the likes). Everything is
+derived from one seed, so the same seed and counts on an empty database
+produce the same rows.
+
+Rows get explicit ids after the current maximum and are written with the
+driver's bulk path (COPY on Postgres with psycopg2, executemany elsewhere),
+bypassing the ORM and its listeners. What the app normally keeps up to date
+on write is filled in here instead: like_count, version, lat/lng/geohash and
+the search index. Likes are generated twice from the same seed, once to
+count them per location and once to insert them, so memory does not grow
+with the number of likes.
+"""
+import bisect
+import csv
+import io
+import itertools
+import json
+import random
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import func, insert, select, text
+
+from api.geo import encode_geohash
+from api.ingest import batched
+from api.models import db, User, Location, SearchToken, user_likes
+from api.passwords import password_hasher
+from api.search import tokenize
+from api.sync import USER_COUNTER, next_change_version
+
+DEFAULT_PASSWORD = "password"
+GENERATE_BATCH_SIZE = 10000
+# SQLite page cache while loading, KiB (the default 2 MiB thrashes on the
+# index B-trees of a million-row table)
+SQLITE_LOAD_CACHE_KIB = 256 * 1024
+# standard deviation of a location's distance from its city, degrees (~15 km)
+JITTER_DEGREES = 0.15
+# share of locations near the city of rank r ~ 1 / r ** CITY_EXPONENT
+CITY_EXPONENT = 0.8
+# popularity of the location of rank r ~ 1 / r ** POPULARITY_EXPONENT
+POPULARITY_EXPONENT = 1.0
+# likes per user ~ Pareto(LIKES_ALPHA): at least 1, median 1-2, mean ~5
+LIKES_ALPHA = 1.2
+MAX_LIKES_PER_USER = 500
+
+NAME_WORDS = ("Cedar", "Pine", "Oak", "Willow", "Big", "Little", "North", "South",
+              "Eagle", "Bear", "Deer", "Hidden", "Rocky", "Clear", "Silver", "Mill")
+FEATURES = {
+    "fishing": ("Lake", "Creek", "River", "Pond", "Reservoir", "Bay", "Pier"),
+    "hunting": ("Woods", "Ridge", "Marsh", "Field", "Hollow", "Bottoms", "Timber"),
+}
+
+USER_COLUMNS = ("id", "email", "password", "user_name", "zipcode")
+LOCATION_COLUMNS = ("id", "name", "type", "position", "directions", "lat", "lng",
+                    "geohash", "like_count", "version", "creator_id")
+LIKE_COLUMNS = ("user_id", "location_id")
+TOKEN_COLUMNS = ("kind", "token", "ref_id")
+
+
+def generated_email(user_id):
+    return f"generated-{user_id}@example.com"
+
+
+class BulkWriter:
+    """Appends tuples to a table inside the session's transaction, using
+    COPY on psycopg2 and a driver-level executemany otherwise."""
+
+    def __init__(self, session):
+        self.connection = session.connection()
+        self.dialect = self.connection.dialect
+        self.preparer = self.dialect.identifier_preparer
+        self.dbapi_connection = self.connection.connection.dbapi_connection
+        self.use_copy = self.dialect.name == "postgresql" and \
+            hasattr(self.dbapi_connection.cursor(), "copy_expert")
+        self._cache_size = None
+
+    def write(self, table, columns, rows):
+        table_name = self.preparer.format_table(table)
+        column_names = ", ".join(self.preparer.quote(column) for column in columns)
+        if self.use_copy:
+            buf = io.StringIO()
+            # None becomes an unquoted empty field, which COPY reads as NULL
+            csv.writer(buf).writerows(rows)
+            buf.seek(0)
+            with self.dbapi_connection.cursor() as cursor:
+                cursor.copy_expert(
+                    f"COPY {table_name} ({column_names}) FROM STDIN WITH (FORMAT csv)", buf)
+        elif self.dialect.paramstyle in ("qmark", "format", "pyformat"):
+            marker = "?" if self.dialect.paramstyle == "qmark" else "%s"
+            self.connection.exec_driver_sql(
+                f"INSERT INTO {table_name} ({column_names}) "
+                f"VALUES ({', '.join([marker] * len(columns))})", rows)
+        else:
+            self.connection.execute(insert(table), [dict(zip(columns, row)) for row in rows])
+
+    def drop_indexes(self, tables):
+        """Drop the secondary indexes of `tables` before a bulk load and
+        return them for create_indexes(): building an index once at the end
+        is much cheaper than updating it row by row. DDL is transactional on
+        SQLite and Postgres, so a rolled back load keeps the indexes. On
+        Postgres the tables are locked against readers until the commit."""
+        if self.dialect.name == "sqlite":
+            self._cache_size = self.connection.exec_driver_sql("PRAGMA cache_size").scalar()
+            self.connection.exec_driver_sql(f"PRAGMA cache_size = -{SQLITE_LOAD_CACHE_KIB}")
+        indexes = [index for table in tables for index in table.indexes]
+        for index in indexes:
+            index.drop(self.connection)
+        return indexes
+
+    def create_indexes(self, indexes):
+        for index in indexes:
+            index.create(self.connection)
+        if self._cache_size is not None:
+            self.connection.exec_driver_sql(f"PRAGMA cache_size = {self._cache_size}")
+
+    def reset_sequence(self, table):
+        """Move a Postgres serial past the explicit ids written."""
+        if self.dialect.name != "postgresql":
+            return
+        table_name = self.preparer.format_table(table)
+        self.connection.execute(text(
+            f"SELECT setval(pg_get_serial_sequence(:table, 'id'), "
+            f"(SELECT MAX(id) FROM {table_name}))"), {"table": table_name})
+
+
+def _next_id(session, model):
+    return (session.scalar(select(func.max(model.id))) or 0) + 1
+
+
+def _user_rows(rng, user_ids, password_hash):
+    for user_id in user_ids:
+        yield (user_id, generated_email(user_id), password_hash,
+               f"user{user_id}", rng.randint(10000, 99999))
+
+
+def _popularity(seed, count):
+    """Cumulative like weights of `count` locations, ranks shuffled so the
+    popular ones are spread over the map."""
+    ranks = list(range(1, count + 1))
+    random.Random(f"{seed}-popularity").shuffle(ranks)
+    return list(itertools.accumulate(1.0 / rank ** POPULARITY_EXPONENT for rank in ranks))
+
+
+def _like_pairs(seed, user_ids, location_ids, cum_weights):
+    """(user_id, location_id) pairs; the same arguments give the same pairs."""
+    rng = random.Random(f"{seed}-likes")
+    for user_id in user_ids:
+        wanted = min(int(rng.paretovariate(LIKES_ALPHA)), MAX_LIKES_PER_USER, len(location_ids))
+        for location_id in sorted(set(rng.choices(location_ids, cum_weights=cum_weights,
+                                                  k=wanted))):
+            yield user_id, location_id
+
+
+def _location_rows(rng, location_ids, cities, creator_ids, like_counts, version):
+    city_weights = list(itertools.accumulate(
+        1.0 / (rank + 1) ** CITY_EXPONENT for rank in range(len(cities))))
+    centres = [(city["name"], city["position"]["lat"], city["position"]["lng"])
+               for city in cities]
+    gauss, choice, random_ = rng.gauss, rng.choice, rng.random
+    kinds = tuple(FEATURES)
+    for offset, location_id in enumerate(location_ids):
+        # rng.choices() for one item costs more than the bisect it wraps
+        city, city_lat, city_lng = centres[bisect.bisect(
+            city_weights, random_() * city_weights[-1], 0, len(centres) - 1)]
+        lat = min(90.0, max(-90.0, gauss(city_lat, JITTER_DEGREES)))
+        lng = min(180.0, max(-180.0, gauss(city_lng, JITTER_DEGREES)))
+        kind = choice(kinds)
+        yield (location_id, f"{city} {choice(NAME_WORDS)} {choice(FEATURES[kind])}", kind,
+               # what json.dumps() gives for this dict, without its overhead
+               f'{{"lat": {lat!r}, "lng": {lng!r}}}',
+               f"https://www.google.com/maps?q={lat:.7f},{lng:.7f}", lat, lng,
+               encode_geohash(lat, lng), like_counts[offset], version,
+               choice(creator_ids) if creator_ids else None)
+
+
+def _location_chunk(seed, first_id, count, cities, creator_ids, like_counts, version):
+    """Rows and search tokens of locations first_id .. first_id + count - 1.
+
+    Each chunk has its own seed, so the rows do not depend on how many
+    workers made them. Runs in a worker process when --workers > 1.
+    """
+    rng = random.Random(f"{seed}-locations-{first_id}")
+    rows = list(_location_rows(rng, range(first_id, first_id + count), cities,
+                               creator_ids, like_counts, version))
+    tokens = [("location", token, row[0]) for row in rows for token in tokenize(row[1])]
+    return rows, tokens
+
+
+def _location_chunks(tasks, workers):
+    """Run _location_chunk over `tasks` in order, in a process pool when
+    workers > 1 with at most 2 * workers chunks in flight (as
+    ingest.iter_ndjson does), so the caller writes while workers generate."""
+    if workers <= 1:
+        for task in tasks:
+            yield _location_chunk(*task)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(_location_chunk, *task))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def load_cities(path):
+    cities = json.loads(path.read_text(encoding="utf-8"))
+    cities = [city for city in cities if isinstance(city, dict) and city.get("name")
+              and isinstance(city.get("position"), dict)
+              and {"lat", "lng"} <= city["position"].keys()]
+    if not cities:
+        raise ValueError(f"{path} has no cities with a name and a position")
+    return cities
+
+
+def generate(timer, users, locations, cities, seed=1, password=DEFAULT_PASSWORD,
+             batch_size=GENERATE_BATCH_SIZE, workers=1):
+    """Append `users` users, `locations` locations and their likes in one
+    transaction, generating locations in `workers` processes. `timer` is a
+    commands.StageTimer. Returns the row counts."""
+    session = db.session
+    writer = BulkWriter(session)
+    counts = {"users": 0, "locations": 0, "likes": 0, "search_tokens": 0}
+
+    with timer("hash"):
+        password_hash = password_hasher.hash(password)
+    first_user = _next_id(session, User)
+    first_location = _next_id(session, Location)
+    # rebuilding the indexes pays off once the load is about as big as
+    # what is already there (ids approximate the row counts)
+    deferred = [User.__table__] if users >= first_user else []
+    if locations >= first_location:
+        deferred += [Location.__table__, SearchToken.__table__, user_likes]
+    indexes = writer.drop_indexes(deferred)
+    _write_rows(writer, timer, counts, users, first_user, locations, first_location,
+                cities, seed, password_hash, batch_size, workers)
+    with timer("indexes"):
+        writer.create_indexes(indexes)
+
+    with timer("commit"):
+        writer.reset_sequence(User.__table__)
+        writer.reset_sequence(Location.__table__)
+        if users:
+            # raw inserts skip the flush listener that bumps this counter
+            next_change_version(session, USER_COUNTER)
+        session.commit()
+    return counts
+
+
+def _write_rows(writer, timer, counts, users, first_user, locations, first_location,
+                cities, seed, password_hash, batch_size, workers):
+    user_ids = range(first_user, first_user + users)
+    for batch in batched(timer.iterate("generate", _user_rows(
+            random.Random(f"{seed}-users"), user_ids, password_hash)), batch_size):
+        with timer("write"):
+            writer.write(User.__table__, USER_COLUMNS, batch)
+        counts["users"] += len(batch)
+
+    location_ids = range(first_location, first_location + locations)
+    like_counts = [0] * locations
+    cum_weights = None
+    if locations:
+        with timer("generate"):
+            cum_weights = _popularity(seed, locations)
+            for _, location_id in _like_pairs(seed, user_ids, location_ids, cum_weights):
+                like_counts[location_id - first_location] += 1
+
+    version = next_change_version(db.session)
+    tasks = ((seed, start, min(batch_size, first_location + locations - start), cities,
+              user_ids, like_counts[start - first_location:start - first_location + batch_size],
+              version)
+             for start in range(first_location, first_location + locations, batch_size))
+    for rows, tokens in timer.iterate("generate", _location_chunks(tasks, workers)):
+        with timer("write"):
+            writer.write(Location.__table__, LOCATION_COLUMNS, rows)
+            writer.write(SearchToken.__table__, TOKEN_COLUMNS, tokens)
+        counts["locations"] += len(rows)
+        counts["search_tokens"] += len(tokens)
+
+    if locations:
+        pairs = _like_pairs(seed, user_ids, location_ids, cum_weights)
+        for batch in batched(timer.iterate("generate", pairs), batch_size):
+            with timer("write"):
+                writer.write(user_likes, LIKE_COLUMNS, batch)
+            counts["likes"] += len(batch)
@@ -0,0 +1,127 @@
+"""
+Small geo helpers: geohash encoding, neighbouring-cell lookup and
+great-circle distances. Used by the Location model and the /location/nearby
+endpoint.
+"""
+from math import radians, sin, cos, asin, sqrt
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = radians(1) * EARTH_RADIUS_KM
+
+# precision stored on Location.geohash (~150m x 150m cells)
+GEOHASH_PRECISION = 7
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def encode_geohash(lat, lng, precision=GEOHASH_PRECISION):
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if lng >= mid:
+                bits = (bits << 1) | 1
+                lng_lo = mid
+            else:
+                bits <<= 1
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                bits = (bits << 1) | 1
+                lat_lo = mid
+            else:
+                bits <<= 1
+                lat_hi = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def cell_size_degrees(precision):
+    """Return (lat_degrees, lng_degrees) covered by one cell at `precision`."""
+    total_bits = 5 * precision
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def _precision_for_radius(lat, radius_km):
+    """Finest precision whose cells are at least radius_km on each side.
+
+    With cells that big, every point within radius_km of (lat, lng) falls in
+    the centre cell or one of its 8 neighbours.
+    """
+    # use the latitude edge closest to a pole, where longitude cells are narrowest
+    edge_lat = min(abs(lat) + radius_km / KM_PER_DEGREE, 89.9)
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lat_deg, lng_deg = cell_size_degrees(precision)
+        if lat_deg * KM_PER_DEGREE >= radius_km and \
+                lng_deg * KM_PER_DEGREE * cos(radians(edge_lat)) >= radius_km:
+            return precision
+    return 0
+
+
+def covering_cells(lat, lng, radius_km):
+    """Geohash prefixes that together cover the circle around (lat, lng).
+
+    Returns an empty list when the radius is too large for any cell size,
+    meaning the caller has to fall back to a plain scan.
+    """
+    precision = _precision_for_radius(lat, radius_km)
+    if precision == 0:
+        return []
+    lat_deg, lng_deg = cell_size_degrees(precision)
+    cells = set()
+    for dlat in (-lat_deg, 0.0, lat_deg):
+        for dlng in (-lng_deg, 0.0, lng_deg):
+            cell_lat = max(-90.0, min(90.0, lat + dlat))
+            cell_lng = (lng + dlng + 180.0) % 360.0 - 180.0
+            cells.add(encode_geohash(cell_lat, cell_lng, precision))
+    return sorted(cells)
+
+
+def prefix_upper_bound(prefix, alphabet=_BASE32):
+    """Smallest string that sorts after every string starting with `prefix`.
+
+    `alphabet` lists every character the column can hold, in sort order
+    (geohash characters by default). Lets a prefix match be written as
+    `prefix <= col < upper`, which any B-tree index can serve. Returns None
+    when there is no upper bound.
+    """
+    while prefix and prefix[-1] == alphabet[-1]:
+        prefix = prefix[:-1]
+    if not prefix:
+        return None
+    return prefix[:-1] + alphabet[alphabet.index(prefix[-1]) + 1]
+
+
+def rank_by_distance(lat, lng, candidates, radius_km, limit):
+    """Rank (item, lat, lng) candidates by distance from (lat, lng).
+
+    Uses the haversine formula with the origin's trig terms hoisted out of
+    the loop. Returns up to `limit` (item, distance_km) pairs within
+    radius_km, closest first.
+    """
+    lat0 = radians(lat)
+    lng0 = radians(lng)
+    cos_lat0 = cos(lat0)
+    scored = []
+    for item, c_lat, c_lng in candidates:
+        p_lat = radians(c_lat)
+        a = sin((p_lat - lat0) / 2) ** 2 + \
+            cos_lat0 * cos(p_lat) * sin((radians(c_lng) - lng0) / 2) ** 2
+        dist = 2 * EARTH_RADIUS_KM * asin(min(1.0, sqrt(a)))
+        if dist <= radius_km:
+            scored.append((dist, item))
+    scored.sort(key=lambda pair: pair[0])
+    return [(item, dist) for dist, item in scored[:limit]]
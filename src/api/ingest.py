@@ -0,0 +1,122 @@
+"""
+Incremental readers for the seed commands.
+
+Both readers yield one record at a time and hold at most one read chunk
+(JSON array) or a bounded window of line batches (NDJSON) in memory, so
+peak memory does not depend on the size of the input file.
+"""
+import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+READ_CHUNK_SIZE = 1 << 16
+NDJSON_BATCH_LINES = 2000
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def iter_records(path, workers=1):
+    """Yield the records of a JSON array file or an NDJSON file.
+
+    Files ending in .ndjson / .jsonl are read line by line (optionally
+    parsed by `workers` processes); anything else must be a JSON array.
+    """
+    if path.suffix in (".ndjson", ".jsonl"):
+        return iter_ndjson(path, workers=workers)
+    return iter_json_array(path)
+
+
+def iter_json_array(path, chunk_size=READ_CHUNK_SIZE):
+    """Yield the items of a top-level JSON array without loading the file."""
+    decoder = json.JSONDecoder()
+    with path.open("r", encoding="utf-8") as f:
+        buf = ""
+        pos = 0
+        eof = False
+
+        def fill():
+            nonlocal buf, pos, eof
+            more = f.read(chunk_size)
+            if not more:
+                eof = True
+            buf = buf[pos:] + more
+            pos = 0
+
+        def peek():
+            # next non-whitespace character, reading more input as needed
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos].isspace():
+                    pos += 1
+                if pos < len(buf) or eof:
+                    return buf[pos] if pos < len(buf) else ""
+                fill()
+
+        if peek() != "[":
+            raise ValueError(f"{path} does not contain a JSON array")
+        pos += 1
+        if peek() == "]":
+            return
+        while True:
+            if not peek():
+                raise ValueError(f"{path}: unexpected end of file")
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+            # a value not yet followed by ',' or ']' may have been cut short
+            # by the chunk boundary (e.g. "2." of "2.5"), read more and retry
+            after = end
+            while after < len(buf) and buf[after].isspace():
+                after += 1
+            if (after == len(buf) or buf[after] not in ",]") and not eof:
+                fill()
+                continue
+            pos = end
+            yield item
+
+            sep = peek()
+            if sep == ",":
+                pos += 1
+            elif sep == "]":
+                return
+            else:
+                raise ValueError(f"{path}: expected ',' or ']' in array")
+
+
+def _loads_lines(lines):
+    return [json.loads(line) for line in lines]
+
+
+def iter_ndjson(path, workers=1, batch_lines=NDJSON_BATCH_LINES):
+    """Yield one record per non-empty line.
+
+    With workers > 1, batches of lines are parsed in a process pool. At
+    most 2 * workers batches are in flight and results keep input order.
+    """
+    with path.open("r", encoding="utf-8") as f:
+        batches = batched((line for line in f if line.strip()), batch_lines)
+        if workers <= 1:
+            for lines in batches:
+                yield from _loads_lines(lines)
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for lines in batches:
+                pending.append(pool.submit(_loads_lines, lines))
+                if len(pending) >= 2 * workers:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
@@ -0,0 +1,69 @@
+"""
+Flask JSON provider backed by orjson, when it is installed.
+
+Output is the same JSON the default provider produces (sorted keys, HTTP
+dates for datetimes, compact unless debugging), except that non-ASCII text
+is emitted as UTF-8 instead of \\u escapes. Anything orjson refuses (e.g.
+integers over 64 bits) falls back to the default encoder.
+
+Set JSON_PROVIDER=default to keep Flask's own provider, and FAST_SERIALIZE
+to the list endpoints ("location,users,fish", "all" or "none") that select
+plain columns instead of loading ORM objects (see Model.serialize_rows).
+"""
+import os
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional, see Pipfile
+    orjson = None
+
+FAST_SERIALIZE_ENDPOINTS = ("location", "users", "fish")
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    # datetimes and dataclasses go through DefaultJSONProvider.default so
+    # they are encoded like before (HTTP dates, asdict)
+    _passthrough = 0 if orjson is None else (
+        orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS)
+
+    def _orjson_dumps(self, obj, indent=False):
+        option = self._passthrough | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, default=self.default, option=option)
+        except (orjson.JSONEncodeError, TypeError):
+            return None
+
+    def dumps(self, obj, **kwargs):
+        if not kwargs:
+            body = self._orjson_dumps(obj)
+            if body is not None:
+                return body.decode()
+        return super().dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = self._orjson_dumps(obj, indent=indent)
+        if body is None:
+            return super().response(obj)
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
+
+
+def setup_json(app):
+    if orjson is not None and os.getenv("JSON_PROVIDER", "orjson") == "orjson":
+        app.json = OrjsonProvider(app)
+
+    value = os.getenv("FAST_SERIALIZE", "all").strip().lower()
+    if value == "all":
+        enabled = set(FAST_SERIALIZE_ENDPOINTS)
+    elif value == "none":
+        enabled = set()
+    else:
+        enabled = {name.strip() for name in value.split(",") if name.strip()}
+    app.config["FAST_SERIALIZE"] = enabled
@@ -0,0 +1,105 @@
+"""
+Location.like_count, the number of user_likes rows per location.
+
+The count is adjusted by +/-1 with an UPDATE whenever likes change, never
+recomputed: code that writes user_likes with Core statements (the like
+endpoints) calls adjust_like_counts() itself, and likes changed through
+the User.liked_locations / Location.liked_by_users relationships (PUT
+/api/user, the admin, deleting a user) are counted by the listeners below.
+`flask recount-likes` repairs any drift.
+"""
+from collections import Counter
+
+from sqlalchemy import event, inspect, select, update, func
+from sqlalchemy.orm import Session
+
+from api.models import user_likes, User, Location
+
+_PENDING_KEY = "like_count_pending"
+_EXPIRE_KEY = "like_count_expire"
+
+
+def adjust_like_counts(session, location_ids, delta):
+    if location_ids:
+        session.execute(update(Location)
+                        .where(Location.id.in_(location_ids))
+                        .values(like_count=Location.like_count + delta)
+                        .execution_options(synchronize_session=False))
+
+
+def recount_likes(session):
+    """Reset every drifted like_count from user_likes. Returns the ids fixed."""
+    actual = (select(func.count())
+              .where(user_likes.c.location_id == Location.id)
+              .scalar_subquery())
+    ids = session.scalars(select(Location.id).where(Location.like_count != actual)).all()
+    if ids:
+        session.execute(update(Location)
+                        .where(Location.id.in_(ids))
+                        .values(like_count=actual)
+                        .execution_options(synchronize_session=False))
+    return ids
+
+
+# ---------------------------------------------------------------------------
+# Likes changed through the relationships. Both sides of a pair record it in
+# their history (back_populates), so pairs are collected in a set first.
+# ---------------------------------------------------------------------------
+def _changed_pairs(session):
+    added, removed = set(), set()
+    for obj in (*session.new, *session.dirty):
+        if isinstance(obj, User):
+            history = inspect(obj).attrs.liked_locations.history
+            added.update((obj, loc) for loc in history.added)
+            removed.update((obj, loc) for loc in history.deleted)
+        elif isinstance(obj, Location):
+            history = inspect(obj).attrs.liked_by_users.history
+            added.update((user, obj) for user in history.added)
+            removed.update((user, obj) for user in history.deleted)
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            removed.update((obj, loc) for loc in obj.liked_locations)
+    # a pair removed and re-added in the same flush nets out
+    return added - removed, removed - added
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_like_changes(session, flush_context, instances):
+    added, removed = _changed_pairs(session)
+    if added or removed:
+        deltas = session.info.setdefault(_PENDING_KEY, Counter())
+        for _, loc in added:
+            deltas[loc] += 1
+        for _, loc in removed:
+            deltas[loc] -= 1
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_like_changes(session, flush_context):
+    # ids of new locations are only known once they are inserted
+    deltas = session.info.pop(_PENDING_KEY, None)
+    if not deltas:
+        return
+    by_delta = {}
+    for loc, delta in deltas.items():
+        if delta and loc.id is not None and loc not in session.deleted:
+            by_delta.setdefault(delta, []).append(loc.id)
+    connection = session.connection()
+    for delta, ids in by_delta.items():
+        connection.execute(update(Location.__table__)
+                           .where(Location.__table__.c.id.in_(ids))
+                           .values(like_count=Location.__table__.c.like_count + delta))
+    session.info.setdefault(_EXPIRE_KEY, set()).update(deltas)
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _expire_like_counts(session, flush_context):
+    for loc in session.info.pop(_EXPIRE_KEY, ()):
+        if loc in session and loc not in session.deleted:
+            session.expire(loc, ["like_count"])
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_like_changes(session):
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_EXPIRE_KEY, None)
@@ -0,0 +1,120 @@
+"""
+Prometheus metrics for every request: latency, SQL statements and time,
+response size. Served at GET /metrics in the Prometheus text format.
+
+Under gunicorn, gunicorn.conf.py points PROMETHEUS_MULTIPROC_DIR at a
+shared directory before the workers start, so each worker writes its
+samples there and /metrics (answered by any worker) adds them all up.
+Without that variable the metrics are per process, which is what
+`flask run` wants.
+
+Set METRICS_TOKEN to require `Authorization: Bearer <token>` on /metrics
+and the other operational endpoints (see metrics_authorized).
+SQL executed while a streamed response is being sent is not counted.
+"""
+import hmac
+import os
+import time
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+try:
+    import prometheus_client
+    from prometheus_client import CollectorRegistry, Histogram, multiprocess
+except ImportError:  # optional, see Pipfile
+    prometheus_client = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+if prometheus_client is not None:
+    REQUEST_LATENCY = Histogram(
+        "http_request_duration_seconds", "Time spent handling a request",
+        ["endpoint", "method", "status"], buckets=LATENCY_BUCKETS)
+    RESPONSE_BYTES = Histogram(
+        "http_response_size_bytes", "Response body size as sent (after compression)",
+        ["endpoint"], buckets=BYTES_BUCKETS)
+    SQL_STATEMENTS = Histogram(
+        "db_statements_per_request", "SQL statements executed per request",
+        ["endpoint"], buckets=QUERY_COUNT_BUCKETS)
+    SQL_TIME = Histogram(
+        "db_time_per_request_seconds", "Time spent in SQL statements per request",
+        ["endpoint"], buckets=LATENCY_BUCKETS)
+
+
+# ---------------------------------------------------------------------------
+# SQL accounting: every engine (primary and replica) adds to the request's
+# counters in `g`
+# ---------------------------------------------------------------------------
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _end_statement(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["metrics_started"].pop()
+    if has_request_context() and "metrics_sql_count" in g:
+        g.metrics_sql_count += 1
+        g.metrics_sql_time += time.perf_counter() - started
+
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+    g.metrics_sql_count = 0
+    g.metrics_sql_time = 0.0
+
+
+def _record_request(response):
+    started = g.pop("metrics_started", None)
+    if started is None:
+        return response
+    # unmatched URLs share one label so scanners can't blow up the series
+    endpoint = request.endpoint or "unmatched"
+    REQUEST_LATENCY.labels(endpoint, request.method, str(response.status_code)).observe(
+        time.perf_counter() - started)
+    SQL_STATEMENTS.labels(endpoint).observe(g.metrics_sql_count)
+    SQL_TIME.labels(endpoint).observe(g.metrics_sql_time)
+    if not response.is_streamed and response.content_length is not None:
+        RESPONSE_BYTES.labels(endpoint).observe(response.content_length)
+    return response
+
+
+def _registry():
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return prometheus_client.REGISTRY
+
+
+def metrics_authorized():
+    """True if METRICS_TOKEN is unset or the request carries it as a bearer token."""
+    token = os.getenv("METRICS_TOKEN")
+    # bytes: compare_digest raises TypeError on non-ASCII str
+    return not token or hmac.compare_digest(
+        request.headers.get("Authorization", "").encode(), f"Bearer {token}".encode())
+
+
+def metrics_view():
+    if not metrics_authorized():
+        return Response("unauthorized\n", status=401, mimetype="text/plain")
+    return Response(prometheus_client.generate_latest(_registry()),
+                    mimetype=prometheus_client.CONTENT_TYPE_LATEST)
+
+
+def setup_metrics(app):
+    """Register the request hooks and /metrics.
+
+    Call before setup_compression: after_request hooks run in reverse, so
+    this one then sees the final, compressed size.
+    """
+    if prometheus_client is None:
+        app.logger.warning("prometheus_client is not installed, /metrics is disabled")
+        return
+    app.before_request(_start_request)
+    app.after_request(_record_request)
+    app.add_url_rule("/metrics", "metrics", metrics_view)
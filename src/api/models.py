@@ -1,10 +1,13 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import String, Integer, JSON, Table, Column, ForeignKey
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import String, Integer, BigInteger, Float, JSON, Table, Column, ForeignKey, Index, UniqueConstraint, select
+from sqlalchemy.orm import Mapped, mapped_column, relationship, validates
 from sqlalchemy import String, Integer
 from sqlalchemy.orm import Mapped, mapped_column
+from collections import defaultdict
+from api.geo import encode_geohash
+from api.replica import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 # ---------------------------------------------------------------------
 # Association table for the many-to-many "likes" relation
@@ -16,8 +19,36 @@ user_likes = Table(
     Column("user_id", Integer, ForeignKey("user.id"), primary_key=True),
     Column("location_id", Integer, ForeignKey(
         "location.id"), primary_key=True),
+    # the primary key serves user -> locations; this serves the likers of
+    # a page of locations (Location._liker_ids)
+    Index("ix_user_likes_location_id_user_id", "location_id", "user_id"),
 )
 
+# ---------------------------------------------------------------------
+# Monotonic change counters (one row per counter name), used to stamp
+# Location.version so clients can ask for "changes since N"
+# ---------------------------------------------------------------------
+change_counter = Table(
+    "change_counter",
+    db.metadata,
+    Column("name", String(50), primary_key=True),
+    Column("value", BigInteger, nullable=False),
+)
+
+# max ids per IN (...) when batch-loading related ids
+SERIALIZE_BATCH_SIZE = 500
+
+
+def _group_pairs(stmt_for_ids, ids):
+    """Run stmt_for_ids(chunk) for each chunk of ids and group the
+    (key, value) rows it returns into {key: [value, ...]}."""
+    grouped = defaultdict(list)
+    for start in range(0, len(ids), SERIALIZE_BATCH_SIZE):
+        chunk = ids[start:start + SERIALIZE_BATCH_SIZE]
+        for key, value in db.session.execute(stmt_for_ids(chunk)):
+            grouped[key].append(value)
+    return grouped
+
 
 class User(db.Model):
     id: Mapped[int] = mapped_column(primary_key=True)
@@ -41,23 +72,88 @@ class User(db.Model):
         cascade="all, delete-orphan",
     )
 
-    def serialize(self):
+    def serialize(self, liked_location_ids=None, added_location_ids=None):
+        if liked_location_ids is None:
+            liked_location_ids = [loc.id for loc in self.liked_locations]
+        if added_location_ids is None:
+            added_location_ids = [loc.id for loc in self.added_locations]
         return {
             "id": self.id,
             "email": self.email,
             "user_name": self.user_name,
-            "liked_location_ids": [loc.id for loc in self.liked_locations],
-            "added_location_ids": [loc.id for loc in self.added_locations],
+            "liked_location_ids": liked_location_ids,
+            "added_location_ids": added_location_ids,
         }
 
+    @staticmethod
+    def _location_ids(user_ids):
+        """Liked and added location ids of `user_ids`, as two
+        {user id: [location id, ...]} dicts (shared by both list paths)."""
+        liked = _group_pairs(lambda chunk: select(user_likes.c.user_id, user_likes.c.location_id)
+                             .where(user_likes.c.user_id.in_(chunk))
+                             .order_by(user_likes.c.location_id), user_ids)
+        added = _group_pairs(lambda chunk: select(Location.creator_id, Location.id)
+                             .where(Location.creator_id.in_(chunk))
+                             .order_by(Location.id), user_ids)
+        return liked, added
+
+    @classmethod
+    def serialize_many(cls, users):
+        """Serialize users loading their liked/added location ids in batches
+        instead of one lazy load per user and relationship."""
+        liked, added = cls._location_ids([user.id for user in users])
+        return [user.serialize(liked_location_ids=liked[user.id],
+                               added_location_ids=added[user.id]) for user in users]
+
+    @classmethod
+    def row_columns(cls):
+        """Columns selected by the list endpoints' projection path."""
+        return (cls.id, cls.email, cls.user_name)
+
+    @classmethod
+    def serialize_rows(cls, rows):
+        """serialize_many() for (id, email, user_name) rows, no ORM objects."""
+        liked, added = cls._location_ids([row[0] for row in rows])
+        return [{
+            "id": user_id,
+            "email": email,
+            "user_name": user_name,
+            "liked_location_ids": liked[user_id],
+            "added_location_ids": added[user_id],
+        } for user_id, email, user_name in rows]
+
 
 class Location(db.Model):
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    name: Mapped[str] = mapped_column(String(100), nullable=False)
+    name: Mapped[str] = mapped_column(String(100), nullable=False, index=True)
     type: Mapped[str] = mapped_column(String(50), nullable=False)
     position: Mapped[dict] = mapped_column(JSON, nullable=False)
     directions: Mapped[str] = mapped_column(String(255), nullable=True)
 
+    # plain copies of position["lat"] / position["lng"] so viewport queries
+    # can use an index instead of scanning the JSON column. They (and
+    # geohash) are kept in sync by _sync_coordinates below, never set them
+    # directly.
+    lat: Mapped[float] = mapped_column(Float, nullable=True)
+    lng: Mapped[float] = mapped_column(Float, nullable=True)
+    # geohash cell of (lat, lng), indexed for radius searches
+    geohash: Mapped[str] = mapped_column(String(12), nullable=True, index=True)
+
+    # set on rows loaded by the seed commands: the feed's key for the row
+    # and a hash of its content, used by `seed-cities --sync`
+    source_key: Mapped[str] = mapped_column(String(120), nullable=True)
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=True)
+
+    # number of user_likes rows for this location, kept up to date by
+    # api.likes; `flask recount-likes` repairs it
+    like_count: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0")
+
+    # change_counter["location"] value of the last write to this row
+    # (set by api.sync on every flush, see get_all_locations?since=)
+    version: Mapped[int] = mapped_column(
+        BigInteger, nullable=False, default=0, index=True)
+
     # creator (one-to-many back to User.added_locations)
     creator_id: Mapped[int] = mapped_column(
         ForeignKey("user.id"), nullable=True)
@@ -70,7 +166,28 @@ class Location(db.Model):
         back_populates="liked_locations",
     )
 
-    def serialize(self):
+    __table_args__ = (
+        Index("ix_location_lat_lng", "lat", "lng"),
+        Index("ix_location_like_count", "like_count", "id"),
+        Index("ix_location_type_like_count", "type", "like_count", "id"),
+        UniqueConstraint("source_key", name="uq_location_source_key"),
+    )
+
+    @validates("position")
+    def _sync_coordinates(self, key, position):
+        try:
+            self.lat = float(position.get("lat"))
+            self.lng = float(position.get("lng"))
+            self.geohash = encode_geohash(self.lat, self.lng)
+        except (AttributeError, TypeError, ValueError):
+            self.lat = None
+            self.lng = None
+            self.geohash = None
+        return position
+
+    def serialize(self, liked_by_user_ids=None):
+        if liked_by_user_ids is None:
+            liked_by_user_ids = [u.id for u in self.liked_by_users]
         return {
             "id": self.id,
             "name": self.name,
@@ -78,16 +195,84 @@ class Location(db.Model):
             "position": self.position,
             "directions": self.directions,
             "creator_id": self.creator_id,
-            "liked_by_user_ids": [u.id for u in self.liked_by_users],
+            "liked_by_user_ids": liked_by_user_ids,
+            "like_count": self.like_count,
         }
 
+    @staticmethod
+    def _liker_ids(location_ids):
+        """{location id: [user id, ...]} for `location_ids` (shared by both list paths)."""
+        return _group_pairs(lambda chunk: select(user_likes.c.location_id, user_likes.c.user_id)
+                            .where(user_likes.c.location_id.in_(chunk))
+                            .order_by(user_likes.c.user_id), location_ids)
+
+    @classmethod
+    def serialize_many(cls, locations):
+        """Serialize locations loading their likers from user_likes in
+        batches instead of one lazy load per location."""
+        likers = cls._liker_ids([loc.id for loc in locations])
+        return [loc.serialize(liked_by_user_ids=likers[loc.id]) for loc in locations]
+
+    @classmethod
+    def row_columns(cls):
+        """Columns selected by the list endpoints' projection path."""
+        return (cls.id, cls.name, cls.type, cls.position, cls.directions,
+                cls.creator_id, cls.like_count)
+
+    @classmethod
+    def serialize_rows(cls, rows):
+        """serialize_many() for row_columns() rows, no ORM objects."""
+        likers = cls._liker_ids([row[0] for row in rows])
+        return [{
+            "id": loc_id,
+            "name": name,
+            "type": type_,
+            "position": position,
+            "directions": directions,
+            "creator_id": creator_id,
+            "liked_by_user_ids": likers[loc_id],
+            "like_count": like_count,
+        } for loc_id, name, type_, position, directions, creator_id, like_count in rows]
+
+
+class LocationTombstone(db.Model):
+    """Marker left behind when a Location is deleted, so delta syncs can
+    report the deletion."""
+    __tablename__ = "location_tombstone"
+    location_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
+
+
+class SearchToken(db.Model):
+    """Inverted index for /api/search: one row per (kind, token, row id).
+
+    The primary key doubles as the index used for prefix range scans.
+    Maintained by api.search, never written directly.
+    """
+    __tablename__ = "search_token"
+    kind: Mapped[str] = mapped_column(String(20), primary_key=True)
+    token: Mapped[str] = mapped_column(String(100), primary_key=True)
+    ref_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+
+    __table_args__ = (
+        Index("ix_search_token_kind_ref_id", "kind", "ref_id"),
+    )
+
 
 class Fish(db.Model):
     id: Mapped[int] = mapped_column(primary_key=True)
-    name: Mapped[str] = mapped_column(String(100), nullable=False)
+    name: Mapped[str] = mapped_column(String(100), nullable=False, index=True)
     wiki_link: Mapped[str] = mapped_column(String(255), nullable=True)
     image_link: Mapped[str] = mapped_column(String(255), nullable=True)
 
+    # feed key and content hash of seeded rows, see `seed-fish --sync`
+    source_key: Mapped[str] = mapped_column(String(120), nullable=True)
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("source_key", name="uq_fish_source_key"),
+    )
+
     def serialize(self):
         return {
             "id": self.id,
@@ -95,3 +280,13 @@ class Fish(db.Model):
             "wiki_link": self.wiki_link,
             "image_link": self.image_link,
         }
+
+    @classmethod
+    def row_columns(cls):
+        """Columns selected by the list endpoints' projection path."""
+        return (cls.id, cls.name, cls.wiki_link, cls.image_link)
+
+    @classmethod
+    def serialize_rows(cls, rows):
+        return [{"id": fish_id, "name": name, "wiki_link": wiki_link, "image_link": image_link}
+                for fish_id, name, wiki_link, image_link in rows]
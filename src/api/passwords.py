@@ -0,0 +1,79 @@
+"""
+Password hashing on a small bounded thread pool.
+
+PBKDF2 spends tens to hundreds of milliseconds of CPU per call. hashlib
+releases the GIL while it runs, so doing it on a dedicated pool keeps the
+request threads (gunicorn gthread, see Procfile) free for other requests,
+and the pool size caps how many cores a login burst can take. Calls beyond
+the pool plus PASSWORD_HASH_QUEUE waiting ones are refused with
+HashingBusy (the routes answer 503) instead of piling up.
+
+The cost is PASSWORD_HASH_ITERATIONS. Stored hashes record their own
+method, so old hashes keep verifying after a change and needs_rehash()
+tells login to upgrade them.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# werkzeug's own default, which existing hashes were created with
+DEFAULT_ITERATIONS = 1_000_000
+DEFAULT_WORKERS = 2
+DEFAULT_QUEUE = 16
+SALT_LENGTH = 16
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing queue is full."""
+
+
+class PasswordHasher:
+    def __init__(self, iterations=DEFAULT_ITERATIONS, workers=DEFAULT_WORKERS,
+                 queue=DEFAULT_QUEUE):
+        self._executor = None
+        self.configure(iterations, workers, queue)
+
+    def configure(self, iterations, workers, queue):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        self.iterations = iterations
+        self.method = f"pbkdf2:sha256:{iterations}"
+        self.workers = workers
+        self.queue = queue
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix="password-hash")
+        self._slots = threading.BoundedSemaphore(workers + queue)
+
+    def _run(self, fn, *args, **kwargs):
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy()
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password,
+                         method=self.method, salt_length=SALT_LENGTH)
+
+    def verify(self, stored_hash, password):
+        return self._run(check_password_hash, stored_hash, password)
+
+    def needs_rehash(self, stored_hash):
+        return stored_hash.split("$", 1)[0] != self.method
+
+
+password_hasher = PasswordHasher()
+
+
+def setup_passwords(app):
+    password_hasher.configure(
+        iterations=int(os.getenv("PASSWORD_HASH_ITERATIONS", DEFAULT_ITERATIONS)),
+        workers=int(os.getenv("PASSWORD_HASH_WORKERS", DEFAULT_WORKERS)),
+        queue=int(os.getenv("PASSWORD_HASH_QUEUE", DEFAULT_QUEUE)),
+    )
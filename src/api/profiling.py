@@ -0,0 +1,175 @@
+"""
+On-demand profiling of single requests.
+
+Set PROFILE_TOKEN to enable it. A request that carries the token in the
+X-Profile header (or the `_profile` query parameter; note that URLs end up
+in access logs) runs under cProfile, and its SQL statements are timed. The
+result is written to PROFILE_DIR:
+
+    <id>.prof   cProfile data, for pstats / snakeviz
+    <id>.json   method, path, status, timings, SQL timeline and the top of
+                the call tree by cumulative time
+
+and the response carries X-Profile-Id. Only the newest PROFILE_KEEP
+profiles are kept; `flask list-profiles` lists them.
+
+One request per process is profiled at a time (cProfile cannot run twice
+concurrently on Python 3.12+); others that ask meanwhile get
+`X-Profile-Id: busy` and run normally. Without PROFILE_TOKEN no hook is
+registered, and with it unflagged requests only pay a header lookup. The
+body of a streamed response is produced after profiling stops.
+"""
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_ARG = "_profile"
+DEFAULT_KEEP = 50
+# functions listed in the .json summary
+SUMMARY_LINES = 40
+
+
+def profile_dir():
+    return Path(os.getenv("PROFILE_DIR")
+                or os.path.join(tempfile.gettempdir(), "fish-and-hunt-profiles"))
+
+
+def list_profiles(directory=None):
+    """Metadata of the stored profiles, newest first."""
+    directory = Path(directory or profile_dir())
+    profiles = []
+    for path in sorted(directory.glob("*.json"), reverse=True):
+        try:
+            profiles.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue  # being written or rotated away
+    return profiles
+
+
+class RequestProfiler:
+    def __init__(self, token=None, directory=None, keep=DEFAULT_KEEP):
+        self.token = token
+        self.directory = Path(directory or profile_dir())
+        self.keep = keep
+        self._lock = threading.Lock()
+        # checked first by the SQL listeners so unprofiled statements cost
+        # one attribute lookup
+        self._running = False
+
+    # -- SQL timeline ------------------------------------------------------
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self._running and has_request_context() and "profile_run" in g:
+            conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        stack = conn.info.get("profile_started")
+        if stack and has_request_context() and "profile_run" in g:
+            started = stack.pop()
+            run = g.profile_run
+            run["sql"].append({
+                "offset_ms": round((started - run["started"]) * 1000, 3),
+                "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+                "statement": statement,
+            })
+
+    # -- request hooks -----------------------------------------------------
+    def start(self):
+        supplied = request.headers.get(PROFILE_HEADER) or request.args.get(PROFILE_ARG)
+        if not supplied or not hmac.compare_digest(supplied.encode(), self.token.encode()):
+            return
+        if not self._lock.acquire(blocking=False):
+            g.profile_busy = True
+            return
+        self._running = True
+        g.profile_run = {"started": time.perf_counter(), "sql": [],
+                         "profile": cProfile.Profile()}
+        g.profile_run["profile"].enable()
+
+    def _stop(self):
+        run = g.pop("profile_run", None)
+        if run is None:
+            return None
+        run["profile"].disable()
+        run["duration_ms"] = round((time.perf_counter() - run["started"]) * 1000, 3)
+        self._running = False
+        self._lock.release()
+        return run
+
+    def finish(self, response):
+        if g.pop("profile_busy", False):
+            response.headers["X-Profile-Id"] = "busy"
+            return response
+        run = self._stop()
+        if run is not None:
+            response.headers["X-Profile-Id"] = self.save(run, response)
+        return response
+
+    def teardown(self, exc):
+        # after_request did not run (an exception escaped it)
+        self._stop()
+
+    # -- storage -----------------------------------------------------------
+    def save(self, run, response):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        now = datetime.now(timezone.utc)
+        profile_id = f"{now:%Y%m%dT%H%M%S-%f}-{uuid.uuid4().hex[:6]}"
+        run["profile"].dump_stats(self.directory / f"{profile_id}.prof")
+
+        summary = io.StringIO()
+        pstats.Stats(run["profile"], stream=summary).sort_stats("cumulative") \
+            .print_stats(SUMMARY_LINES)
+        meta = {
+            "id": profile_id,
+            "created": now.isoformat(),
+            "method": request.method,
+            "path": request.path,
+            "endpoint": request.endpoint,
+            "status": response.status_code,
+            "duration_ms": run["duration_ms"],
+            "sql_count": len(run["sql"]),
+            "sql_ms": round(sum(s["duration_ms"] for s in run["sql"]), 3),
+            "sql": run["sql"],
+            "summary": summary.getvalue(),
+        }
+        # write then rename so list_profiles never reads half a file
+        tmp = self.directory / f".{profile_id}.json.tmp"
+        tmp.write_text(json.dumps(meta, indent=2))
+        tmp.replace(self.directory / f"{profile_id}.json")
+        self.rotate()
+        return profile_id
+
+    def rotate(self):
+        stored = sorted(self.directory.glob("*.json"), reverse=True)
+        for path in stored[self.keep:]:
+            path.unlink(missing_ok=True)
+            path.with_suffix(".prof").unlink(missing_ok=True)
+
+
+request_profiler = RequestProfiler()
+
+
+def setup_profiling(app):
+    request_profiler.token = os.getenv("PROFILE_TOKEN") or None
+    request_profiler.directory = profile_dir()
+    request_profiler.keep = int(os.getenv("PROFILE_KEEP", DEFAULT_KEEP))
+    if request_profiler.token is None:
+        return
+    event.listen(Engine, "before_cursor_execute", request_profiler.before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", request_profiler.after_cursor_execute)
+    app.before_request(request_profiler.start)
+    app.after_request(request_profiler.finish)
+    app.teardown_request(request_profiler.teardown)
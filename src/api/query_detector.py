@@ -0,0 +1,147 @@
+"""
+N+1 and slow-query detector for development and tests.
+
+Records every SQL statement a request runs, with its duration and the
+project source line that issued it, and after the request flags:
+
+  * repeated statement shapes: the same SQL (literals and IN lists
+    collapsed) run more than QUERY_DETECTOR_REPEAT times, the usual sign of
+    a lazy relationship loaded once per row;
+  * slow statements: longer than QUERY_DETECTOR_SLOW_MS.
+
+QUERY_DETECTOR selects the mode: "off" (default unless FLASK_DEBUG=1),
+"warn" (log each finding, default in debug) or "raise" (raise
+QueryBudgetExceeded, which fails the request and, with TESTING set, the
+test that made it). Responses also get an X-Query-Count header while the
+detector is on. Statements run while a streamed response is being sent are
+not checked.
+"""
+import os
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# frames from files under src/ (except this one) count as the source line
+_PROJECT_DIR = str(Path(__file__).resolve().parent.parent)
+_THIS_FILE = str(Path(__file__).resolve())
+
+_IN_LIST_RE = re.compile(r"\((?:\s*(?:\?|%\(\w+\)s|:\w+)\s*,)+\s*(?:\?|%\(\w+\)s|:\w+)\s*\)")
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SPACE_RE = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(Exception):
+    def __init__(self, findings):
+        self.findings = findings
+        super().__init__("\n".join(describe(finding) for finding in findings))
+
+
+def statement_shape(statement):
+    shape = _STRING_RE.sub("?", statement)
+    shape = _NUMBER_RE.sub("?", shape)
+    shape = _IN_LIST_RE.sub("(?)", shape)
+    return _SPACE_RE.sub(" ", shape).strip()
+
+
+def _source_line():
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_PROJECT_DIR) and filename != _THIS_FILE:
+            return f"{os.path.relpath(filename, _PROJECT_DIR)}:{frame.f_lineno}"
+        frame = frame.f_back
+    return None
+
+
+def _view_location():
+    # statements issued outside src/ (e.g. a view registered by a test):
+    # point at the view function instead
+    view = current_app.view_functions.get(request.endpoint)
+    code = getattr(view, "__code__", None)
+    return f"{code.co_filename}:{code.co_firstlineno}" if code else None
+
+
+def describe(finding):
+    if finding["kind"] == "repeated":
+        what = f"{finding['count']}x the same statement"
+    else:
+        what = f"slow statement ({finding['duration_ms']:.1f} ms)"
+    return (f"{finding['endpoint']}: {what} from {finding['source'] or '?'}: "
+            f"{finding['statement'][:200]}")
+
+
+class QueryDetector:
+    def __init__(self, mode="off", repeat_threshold=5, slow_ms=100.0):
+        self.mode = mode
+        self.repeat_threshold = repeat_threshold
+        self.slow_ms = slow_ms
+
+    # -- recording ---------------------------------------------------------
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and "query_log" in g:
+            conn.info.setdefault("query_detector_started", []).append(
+                (time.perf_counter(), _source_line()))
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        stack = conn.info.get("query_detector_started")
+        if stack and has_request_context() and "query_log" in g:
+            started, source = stack.pop()
+            g.query_log.append((statement, (time.perf_counter() - started) * 1000, source))
+
+    def start_request(self):
+        g.query_log = []
+
+    # -- analysis ----------------------------------------------------------
+    def findings(self, endpoint, query_log):
+        found = []
+        counts = Counter()
+        sources = defaultdict(Counter)
+        for statement, duration_ms, source in query_log:
+            shape = statement_shape(statement)
+            counts[shape] += 1
+            sources[shape][source] += 1
+            if duration_ms > self.slow_ms:
+                found.append({"kind": "slow", "endpoint": endpoint, "statement": statement,
+                              "duration_ms": duration_ms, "source": source})
+        for shape, count in counts.items():
+            if count > self.repeat_threshold:
+                found.append({"kind": "repeated", "endpoint": endpoint, "statement": shape,
+                              "count": count, "source": sources[shape].most_common(1)[0][0]})
+        return found
+
+    def finish_request(self, response):
+        query_log = g.pop("query_log", None)
+        if query_log is None:
+            return response
+        response.headers["X-Query-Count"] = str(len(query_log))
+        found = self.findings(request.endpoint or request.path, query_log)
+        for finding in found:
+            finding["source"] = finding["source"] or _view_location()
+        g.query_findings = found
+        if found and self.mode == "raise":
+            raise QueryBudgetExceeded(found)
+        for finding in found:
+            current_app.logger.warning("query detector: %s", describe(finding))
+        return response
+
+
+query_detector = QueryDetector()
+
+
+def setup_query_detector(app):
+    query_detector.mode = os.getenv("QUERY_DETECTOR", "warn" if app.debug else "off")
+    query_detector.repeat_threshold = int(os.getenv("QUERY_DETECTOR_REPEAT", 5))
+    query_detector.slow_ms = float(os.getenv("QUERY_DETECTOR_SLOW_MS", 100))
+    if query_detector.mode not in ("warn", "raise"):
+        return
+    event.listen(Engine, "before_cursor_execute", query_detector.before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", query_detector.after_cursor_execute)
+    app.before_request(query_detector.start_request)
+    app.after_request(query_detector.finish_request)
@@ -0,0 +1,139 @@
+"""
+Optional read replica for read-only GET handlers.
+
+Set DATABASE_REPLICA_URL to route the SELECTs of views decorated with
+@replica_read to the "replica" bind; everything else, and every write,
+stays on the primary. Two SQLite files or two local Postgres databases
+work for trying it out (the replica copy is up to you).
+
+Read-your-writes: a response to a request that committed a write carries
+the change_counter values the write allocated (api.sync), as the
+`read_after` cookie and the X-Read-After header, e.g. "location:42,user:7".
+While a client sends either back, its @replica_read requests check the
+replica's counters first (one primary-key SELECT) and read from the primary
+until the replica has caught up with those values. The marker travels with
+the client, so it works whichever worker serves the next request. The
+cookie lives REPLICA_READ_YOUR_WRITES seconds (30); API clients without
+a cookie jar can echo the header instead.
+"""
+import os
+from functools import wraps
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy import column, event, select, table
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+REPLICA_BIND = "replica"
+READ_AFTER_COOKIE = "read_after"
+READ_AFTER_HEADER = "X-Read-After"
+# session.info key: {counter name: value} allocated by this transaction,
+# filled in by api.sync.next_change_version
+WRITTEN_VERSIONS = "written_change_versions"
+# counters a client can ask for at once; anything beyond is ignored
+MAX_READ_AFTER_COUNTERS = 8
+
+# models.change_counter (api.models imports this module)
+_change_counter = table("change_counter", column("name"), column("value"))
+
+
+def _parse_versions(raw):
+    versions = {}
+    for part in (raw or "").split(",")[:MAX_READ_AFTER_COUNTERS]:
+        name, _, value = part.partition(":")
+        try:
+            versions[name.strip()] = int(value)
+        except ValueError:
+            continue
+    return versions
+
+
+def _merge_versions(versions, more):
+    for name, value in more.items():
+        versions[name] = max(versions.get(name, 0), value)
+    return versions
+
+
+def _read_after():
+    """Counter values the client has written up to, from cookie and header."""
+    return _merge_versions(_parse_versions(request.cookies.get(READ_AFTER_COOKIE)),
+                           _parse_versions(request.headers.get(READ_AFTER_HEADER)))
+
+
+def _replica_caught_up(session, versions):
+    current = dict(session.execute(
+        select(_change_counter.c.name, _change_counter.c.value)
+        .where(_change_counter.c.name.in_(list(versions)))).all())
+    return all(current.get(name, 0) >= value for name, value in versions.items())
+
+
+def replica_read(view):
+    """Run the view's SELECTs on the replica unless it has not caught up
+    with the client's own writes yet (see the module docstring).
+
+    Put it below @jwt_required, and above @conditional_response /
+    @cached_response so the change counters behind their ETags and cache
+    keys are read from the same bind as the body.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        extension = current_app.extensions["sqlalchemy"]
+        if REPLICA_BIND in extension.engines:
+            g.use_replica = True
+            versions = _read_after()
+            if versions and not _replica_caught_up(extension.session, versions):
+                g.use_replica = False
+        return view(*args, **kwargs)
+    return wrapper
+
+
+class RoutingSession(FlaskSession):
+    """Flask-SQLAlchemy session that sends SELECTs to the replica bind while
+    a @replica_read view runs."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and isinstance(clause, Select) and not self._flushing \
+                and has_app_context() and g.get("use_replica"):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+# ---------------------------------------------------------------------------
+# Hand the counter values of committed writes back to the client
+# ---------------------------------------------------------------------------
+@event.listens_for(Session, "after_commit")
+def _remember_written_versions(session):
+    versions = session.info.pop(WRITTEN_VERSIONS, None)
+    if versions and has_request_context():
+        _merge_versions(g.setdefault("read_after", {}), versions)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_written_versions(session):
+    session.info.pop(WRITTEN_VERSIONS, None)
+
+
+def _send_read_after(response):
+    written = g.pop("read_after", None)
+    if written and REPLICA_BIND in current_app.extensions["sqlalchemy"].engines:
+        raw = ",".join(f"{name}:{value}" for name, value in
+                       sorted(_merge_versions(_read_after(), written).items()))
+        response.set_cookie(READ_AFTER_COOKIE, raw, max_age=current_app.config["REPLICA_READ_YOUR_WRITES"],
+                            httponly=True, samesite="Lax")
+        response.headers[READ_AFTER_HEADER] = raw
+    return response
+
+
+def replica_binds(replica_url, options):
+    """SQLALCHEMY_BINDS entry for DATABASE_REPLICA_URL, {} when unset."""
+    if not replica_url:
+        return {}
+    return {REPLICA_BIND: {"url": replica_url, **options}}
+
+
+def setup_replica(app):
+    app.config["REPLICA_READ_YOUR_WRITES"] = int(os.getenv("REPLICA_READ_YOUR_WRITES", 30))
+    app.after_request(_send_read_after)
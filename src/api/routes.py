@@ -2,12 +2,22 @@
 This module takes care of starting the API Server, Loading the DB and Adding the endpoints
 """
 from flask import Flask, request, jsonify, url_for, Blueprint
-from werkzeug.security import generate_password_hash, check_password_hash
-from api.models import db, User, Location, Fish
-from api.utils import generate_sitemap, APIException
+from api.models import db, User, Location, Fish, user_likes
+from api.utils import generate_sitemap, APIException, list_response, fast_serialize
 from flask_cors import CORS
 from flask_jwt_extended import create_access_token, get_jwt_identity, jwt_required
-from sqlalchemy import select
+from sqlalchemy import select, insert, delete, or_, and_
+from sqlalchemy.exc import IntegrityError
+from api.cache import location_cache, cached_response, conditional_response, load_identity
+from api.sync import location_changes_since, stamp_locations
+from api.likes import adjust_like_counts
+from api.passwords import password_hasher, HashingBusy
+from api.database import pool_status
+from api.metrics import metrics_authorized
+from api.replica import replica_read
+from api.search import SEARCH_MODELS, search
+from api.suggest import fish_suggestions
+from api.geo import KM_PER_DEGREE, covering_cells, prefix_upper_bound, rank_by_distance
 
 api = Blueprint('api', __name__)
 
@@ -28,9 +38,13 @@ def handle_hello():
 
 
 @api.route("/users", methods=["GET"])
+@replica_read
+@conditional_response
 def get_all_users():
-    users = db.session.execute(select(User)).scalars().all()
-    return jsonify([user.serialize() for user in users]), 200
+    """List users. Supports keyset pagination and streaming, see list_response."""
+    if fast_serialize("users"):
+        return list_response(select(*User.row_columns()), User.id, User.serialize_rows)
+    return list_response(select(User), User.id, User.serialize_many)
 
 
 # ---------------------------------------------------------------------------- #
@@ -38,6 +52,8 @@ def get_all_users():
 # ---------------------------------------------------------------------------- #
 @api.route("/user", methods=["GET"])
 @jwt_required()
+@replica_read
+@conditional_response
 def get_current_user():
     """Return the currently authenticated user's public info.
 
@@ -50,26 +66,17 @@ def get_current_user():
     except Exception:
         return jsonify({"message": "Invalid token identity"}), 401
 
-    user = db.session.scalars(select(User).where(
-        User.id == user_id)).one_or_none()
+    user = load_identity(user_id)
     if user is None:
         return jsonify({"message": "User not found"}), 404
 
-    # prepare liked and added locations if the relationships exist
-    liked = []
-    added = []
-    if hasattr(user, "liked_locations") and getattr(user, "liked_locations") is not None:
-        try:
-            liked = [loc.serialize()
-                     for loc in getattr(user, "liked_locations")]
-        except Exception:
-            liked = []
-    if hasattr(user, "added_locations") and getattr(user, "added_locations") is not None:
-        try:
-            added = [loc.serialize()
-                     for loc in getattr(user, "added_locations")]
-        except Exception:
-            added = []
+    # liked and added locations, with their likers loaded in batches
+    liked = Location.serialize_many(db.session.scalars(
+        select(Location).join(user_likes, user_likes.c.location_id == Location.id)
+        .where(user_likes.c.user_id == user.id).order_by(Location.id)).all())
+    added = Location.serialize_many(db.session.scalars(
+        select(Location).where(Location.creator_id == user.id)
+        .order_by(Location.id)).all())
 
     return jsonify({
         "user_name": user.user_name,
@@ -152,9 +159,119 @@ def update_current_user():
     return jsonify({"message": "User updated", "updated": updated}), 200
 
 
+# ---------------------------------------------------------------------------- #
+#                          POST/DELETE Current User Likes                      #
+# ---------------------------------------------------------------------------- #
+LIKES_BATCH_MAX = 500
+
+
+def _change_likes(user_id, add_ids, remove_ids):
+    """Insert/delete only the given user_likes rows and bump the versions of
+    the locations that changed. Returns (added_ids, removed_ids)."""
+    added = []
+    if add_ids:
+        existing = set(db.session.scalars(select(Location.id)
+                                          .where(Location.id.in_(add_ids))))
+        already = set(db.session.scalars(select(user_likes.c.location_id).where(
+            user_likes.c.user_id == user_id,
+            user_likes.c.location_id.in_(add_ids))))
+        added = sorted(existing - already)
+        if added:
+            db.session.execute(insert(user_likes), [
+                {"user_id": user_id, "location_id": location_id}
+                for location_id in added])
+    removed = []
+    if remove_ids:
+        removed = sorted(db.session.scalars(select(user_likes.c.location_id).where(
+            user_likes.c.user_id == user_id,
+            user_likes.c.location_id.in_(remove_ids))))
+        if removed:
+            db.session.execute(delete(user_likes).where(
+                user_likes.c.user_id == user_id,
+                user_likes.c.location_id.in_(removed)))
+    adjust_like_counts(db.session, added, 1)
+    adjust_like_counts(db.session, removed, -1)
+    stamp_locations(db.session, added + removed)
+    db.session.commit()
+    return added, removed
+
+
+def _likes_user_id():
+    try:
+        user_id = int(get_jwt_identity())
+    except Exception:
+        return None
+    if load_identity(user_id) is None:
+        return None
+    return user_id
+
+
+@api.route("/user/likes/<int:location_id>", methods=["POST", "DELETE"])
+@jwt_required()
+def change_like(location_id):
+    """Like (POST) or unlike (DELETE) one location. Both are idempotent."""
+    user_id = _likes_user_id()
+    if user_id is None:
+        return jsonify({"message": "User not found"}), 404
+
+    try:
+        if request.method == "POST":
+            added, _ = _change_likes(user_id, [location_id], [])
+            if not added and db.session.get(Location, location_id) is None:
+                return jsonify({"message": "Location not found"}), 404
+            return jsonify({"location_id": location_id, "liked": True}), 201 if added else 200
+        _change_likes(user_id, [], [location_id])
+        return jsonify({"location_id": location_id, "liked": False}), 200
+    except IntegrityError:
+        # a concurrent request for the same pair got there first
+        db.session.rollback()
+        return jsonify({"message": "Conflicting update, please retry"}), 409
+
+
+@api.route("/user/likes", methods=["POST"])
+@jwt_required()
+def change_likes():
+    """Apply several likes/unlikes at once.
+
+    Body: {"add": [location ids], "remove": [location ids]}. Unknown ids and
+    ids already in the requested state are ignored.
+    """
+    user_id = _likes_user_id()
+    if user_id is None:
+        return jsonify({"message": "User not found"}), 404
+
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({"message": "Invalid JSON body"}), 400
+    ids = {}
+    for key in ("add", "remove"):
+        value = body.get(key) or []
+        if not isinstance(value, list) or not all(
+                isinstance(i, int) and not isinstance(i, bool) for i in value):
+            return jsonify({"message": f"Field '{key}' must be an array of location ids"}), 400
+        ids[key] = set(value)
+    if len(ids["add"]) + len(ids["remove"]) > LIKES_BATCH_MAX:
+        return jsonify({"message": f"At most {LIKES_BATCH_MAX} ids per request"}), 400
+    if ids["add"] & ids["remove"]:
+        return jsonify({"message": "An id cannot be both added and removed"}), 400
+
+    try:
+        added, removed = _change_likes(user_id, list(ids["add"]), list(ids["remove"]))
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"message": "Conflicting update, please retry"}), 409
+    return jsonify({"added": added, "removed": removed}), 200
+
+
 # ---------------------------------------------------------------------------- #
 #                               POST User Signup                               #
 # ---------------------------------------------------------------------------- #
+def _hashing_busy():
+    response = jsonify({"message": "Server busy, please retry"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+
 @api.route('/signup', methods=["POST"])
 def handle_signup():
     # ensure a JSON body was provided
@@ -184,8 +301,10 @@ def handle_signup():
     if User.query.filter_by(email=email).first():
         return jsonify({"message": "User already exists, please login!"}), 400
 
-    hashed_password = generate_password_hash(
-        password, method='pbkdf2:sha256', salt_length=16)
+    try:
+        hashed_password = password_hasher.hash(password)
+    except HashingBusy:
+        return _hashing_busy()
 
     # create & persist the user
     newUser = User(email=email.strip(), password=hashed_password,
@@ -218,8 +337,15 @@ def handle_login():
     if user is None:
         return jsonify(dict(message="User doesn't exist")), 400
     # compare the provided password with the stored hash
-    if not check_password_hash(user.password, password):
-        return jsonify(dict(message="Bad Credentials")), 400
+    try:
+        if not password_hasher.verify(user.password, password):
+            return jsonify(dict(message="Bad Credentials")), 400
+        # upgrade hashes made with a different PASSWORD_HASH_ITERATIONS
+        if password_hasher.needs_rehash(user.password):
+            user.password = password_hasher.hash(password)
+            db.session.commit()
+    except HashingBusy:
+        return _hashing_busy()
     # user has been authenticated
     # create the token
     user_token = create_access_token(identity=str(user.id))
@@ -242,10 +368,194 @@ def handle_logout():
 # ---------------------------------------------------------------------------- #
 #                               GET All Locations                              #
 # ---------------------------------------------------------------------------- #
+def _parse_bbox(raw):
+    """Parse "minLat,minLng,maxLat,maxLng" into a tuple of floats.
+
+    Returns None when the value is malformed or out of range. A minLng
+    greater than maxLng is allowed and means the box crosses the antimeridian.
+    """
+    try:
+        min_lat, min_lng, max_lat, max_lng = (float(v) for v in raw.split(","))
+    except ValueError:
+        return None
+    if not (-90 <= min_lat <= max_lat <= 90):
+        return None
+    if not (-180 <= min_lng <= 180) or not (-180 <= max_lng <= 180):
+        return None
+    return min_lat, min_lng, max_lat, max_lng
+
+
 @api.route("/location", methods=["GET"])
+@replica_read
+@conditional_response
+@cached_response(location_cache)
 def get_all_locations():
-    locations = db.session.execute(select(Location)).scalars().all()
-    return jsonify([location.serialize() for location in locations]), 200
+    """List locations.
+
+    Optional query params:
+      bbox=minLat,minLng,maxLat,maxLng  only locations inside the viewport
+      type=fishing|hunting              only locations of that type
+    plus the keyset pagination / streaming params of list_response.
+
+    since=<version> switches to delta mode and returns only what changed
+    after that version: {"version": N, "upserted": [...], "deleted": [ids]}.
+    Start with since=0 and pass the returned version on the next call;
+    apply "deleted" before "upserted".
+    """
+    since_arg = request.args.get("since")
+    if since_arg is not None:
+        try:
+            since = int(since_arg)
+        except ValueError:
+            return jsonify({"message": "since must be an integer version"}), 400
+        return jsonify(location_changes_since(since)), 200
+
+    fast = fast_serialize("location")
+    stmt = select(*Location.row_columns()) if fast else select(Location)
+
+    bbox_arg = request.args.get("bbox")
+    if bbox_arg is not None:
+        bbox = _parse_bbox(bbox_arg)
+        if bbox is None:
+            return jsonify({"message": "bbox must be 'minLat,minLng,maxLat,maxLng' with valid coordinates"}), 400
+        min_lat, min_lng, max_lat, max_lng = bbox
+        stmt = stmt.where(Location.lat.between(min_lat, max_lat))
+        if min_lng <= max_lng:
+            stmt = stmt.where(Location.lng.between(min_lng, max_lng))
+        else:
+            stmt = stmt.where(or_(Location.lng >= min_lng,
+                                  Location.lng <= max_lng))
+
+    type_arg = request.args.get("type")
+    if type_arg:
+        if type_arg not in {"fishing", "hunting"}:
+            return jsonify({"message": "type must be 'fishing' or 'hunting'"}), 400
+        stmt = stmt.where(Location.type == type_arg)
+
+    return list_response(stmt, Location.id,
+                         Location.serialize_rows if fast else Location.serialize_many)
+
+
+# ---------------------------------------------------------------------------- #
+#                            GET Location Cache Stats                          #
+# ---------------------------------------------------------------------------- #
+@api.route("/location/cache-stats", methods=["GET"])
+def get_location_cache_stats():
+    """Hit/miss counters of this worker's GET /api/location cache.
+
+    Requires METRICS_TOKEN when it is set, like /metrics.
+    """
+    if not metrics_authorized():
+        return jsonify({"message": "unauthorized"}), 401
+    return jsonify(location_cache.stats()), 200
+
+
+# ---------------------------------------------------------------------------- #
+#                             GET Database Pool Stats                          #
+# ---------------------------------------------------------------------------- #
+@api.route("/db/pool-stats", methods=["GET"])
+def get_db_pool_stats():
+    """Connection pool counters for this process (see api.database), one
+    entry per bind: "primary" and, when configured, "replica".
+
+    Requires METRICS_TOKEN when it is set, like /metrics.
+    """
+    if not metrics_authorized():
+        return jsonify({"message": "unauthorized"}), 401
+    return jsonify({bind or "primary": pool_status(engine)
+                    for bind, engine in db.engines.items()}), 200
+
+
+# ---------------------------------------------------------------------------- #
+#                             GET Nearby Locations                             #
+# ---------------------------------------------------------------------------- #
+NEARBY_MAX_RADIUS_KM = 500
+NEARBY_MAX_LIMIT = 200
+
+
+@api.route("/location/nearby", methods=["GET"])
+def get_nearby_locations():
+    """Return the closest locations to lat/lng, sorted by distance.
+
+    Query params: lat, lng (required), radius_km (default 25, max 500),
+    limit (default 20, max 200). Each location gets an extra "distance_km".
+    """
+    try:
+        lat = float(request.args["lat"])
+        lng = float(request.args["lng"])
+        radius_km = float(request.args.get("radius_km", 25))
+        limit = int(request.args.get("limit", 20))
+    except (KeyError, ValueError):
+        return jsonify({"message": "lat and lng are required; radius_km and limit must be numbers"}), 400
+    if not (-90 <= lat <= 90) or not (-180 <= lng <= 180):
+        return jsonify({"message": "position out of range"}), 400
+    if not (0 < radius_km <= NEARBY_MAX_RADIUS_KM):
+        return jsonify({"message": f"radius_km must be between 0 and {NEARBY_MAX_RADIUS_KM}"}), 400
+    if not (0 < limit <= NEARBY_MAX_LIMIT):
+        return jsonify({"message": f"limit must be between 1 and {NEARBY_MAX_LIMIT}"}), 400
+
+    # only look at the geohash cells around the point; fall back to a
+    # latitude band when the radius is too wide for the cell grid
+    stmt = select(Location.id, Location.lat, Location.lng)
+    cells = covering_cells(lat, lng, radius_km)
+    if cells:
+        ranges = []
+        for cell in cells:
+            upper = prefix_upper_bound(cell)
+            if upper is None:
+                ranges.append(Location.geohash >= cell)
+            else:
+                ranges.append(and_(Location.geohash >= cell,
+                                   Location.geohash < upper))
+        stmt = stmt.where(or_(*ranges))
+    else:
+        lat_span = radius_km / KM_PER_DEGREE
+        stmt = stmt.where(Location.lat.between(lat - lat_span, lat + lat_span))
+
+    candidates = db.session.execute(stmt).all()
+    ranked = rank_by_distance(lat, lng, candidates, radius_km, limit)
+    if not ranked:
+        return jsonify([]), 200
+
+    by_id = {loc.id: loc for loc in db.session.scalars(
+        select(Location).where(Location.id.in_([loc_id for loc_id, _ in ranked])))}
+    # a candidate deleted since the first query is simply left out
+    ranked = [(loc_id, dist) for loc_id, dist in ranked if loc_id in by_id]
+    results = Location.serialize_many([by_id[loc_id] for loc_id, _ in ranked])
+    for item, (_, dist) in zip(results, ranked):
+        item["distance_km"] = round(dist, 3)
+    return jsonify(results), 200
+
+
+# ---------------------------------------------------------------------------- #
+#                               GET Top Locations                              #
+# ---------------------------------------------------------------------------- #
+TOP_MAX_LIMIT = 100
+
+
+@api.route("/location/top", methods=["GET"])
+@conditional_response
+@cached_response(location_cache)
+def get_top_locations():
+    """Most-liked locations, most likes first (ties: newest first).
+
+    Query params: type (optional, e.g. fishing/hunting), limit (default 10,
+    max 100). Reads the like_count index, no aggregation over user_likes.
+    """
+    try:
+        limit = int(request.args.get("limit", 10))
+    except ValueError:
+        return jsonify({"message": "limit must be an integer"}), 400
+    if not (1 <= limit <= TOP_MAX_LIMIT):
+        return jsonify({"message": f"limit must be between 1 and {TOP_MAX_LIMIT}"}), 400
+
+    stmt = select(Location)
+    loc_type = request.args.get("type")
+    if loc_type:
+        stmt = stmt.where(Location.type == loc_type)
+    # (like_count, id) both descending is a plain backward scan of the index
+    stmt = stmt.order_by(Location.like_count.desc(), Location.id.desc()).limit(limit)
+    return jsonify(Location.serialize_many(db.session.scalars(stmt).all())), 200
 
 
 # ---------------------------------------------------------------------------- #
@@ -304,6 +614,82 @@ def create_locations():
     # }
 
 
+# ---------------------------------------------------------------------------- #
+#                                GET All Fish                                  #
+# ---------------------------------------------------------------------------- #
+@api.route('/fish-species', methods=['GET'])
+def get_fish_species():
+    """List fish species. Supports keyset pagination and streaming, see list_response."""
+    if fast_serialize("fish"):
+        return list_response(select(*Fish.row_columns()), Fish.id, Fish.serialize_rows)
+    return list_response(select(Fish), Fish.id,
+                         lambda fish: [f.serialize() for f in fish])
+
+
+# ---------------------------------------------------------------------------- #
+#                             GET Fish Suggestions                             #
+# ---------------------------------------------------------------------------- #
+SUGGEST_MAX_LIMIT = 50
+
+
+@api.route('/fish-species/suggest', methods=['GET'])
+def suggest_fish_species():
+    """Typeahead over fish names, served from the in-memory prefix index.
+
+    Query params: prefix (required), limit (default 10, max 50).
+    Matches the start of any word in the name. Returns [{"id", "name"}].
+    """
+    prefix = request.args.get("prefix") or ""
+    try:
+        limit = int(request.args.get("limit", 10))
+    except ValueError:
+        return jsonify({"message": "limit must be an integer"}), 400
+    if not (1 <= limit <= SUGGEST_MAX_LIMIT):
+        return jsonify({"message": f"limit must be between 1 and {SUGGEST_MAX_LIMIT}"}), 400
+
+    fish_suggestions.ensure_loaded()
+    return jsonify(fish_suggestions.suggest(prefix, limit)), 200
+
+
+# ---------------------------------------------------------------------------- #
+#                                  GET Search                                  #
+# ---------------------------------------------------------------------------- #
+SEARCH_MAX_LIMIT = 100
+
+
+@api.route('/search', methods=['GET'])
+def search_records():
+    """Ranked name search.
+
+    Query params: q (required), kind=location|fish (default location),
+    limit (default 20, max 100), offset (default 0).
+    Returns {"results": [...], "next_offset": <offset or null>}.
+    """
+    q = (request.args.get("q") or "").strip()
+    kind = request.args.get("kind", "location")
+    if not q:
+        return jsonify({"message": "q is required"}), 400
+    if kind not in SEARCH_MODELS:
+        return jsonify({"message": "kind must be 'location' or 'fish'"}), 400
+    try:
+        limit = int(request.args.get("limit", 20))
+        offset = int(request.args.get("offset", 0))
+    except ValueError:
+        return jsonify({"message": "limit and offset must be integers"}), 400
+    if not (1 <= limit <= SEARCH_MAX_LIMIT) or offset < 0:
+        return jsonify({"message": f"limit must be between 1 and {SEARCH_MAX_LIMIT} and offset >= 0"}), 400
+
+    rows, has_more = search(kind, q, limit, offset)
+    if kind == "location":
+        results = Location.serialize_many(rows)
+    else:
+        results = [row.serialize() for row in rows]
+    return jsonify({
+        "results": results,
+        "next_offset": offset + limit if has_more else None,
+    }), 200
+
+
 # ---------------------------------------------------------------------------- #
 #                               POST Create Fish                               #
 # ---------------------------------------------------------------------------- #
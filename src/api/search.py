@@ -0,0 +1,144 @@
+"""
+Token index behind GET /api/search.
+
+Names are split into lowercase ASCII word tokens and stored in the
+search_token table. A query matches rows that have, for every query term,
+a token starting with that term; rows are ranked by how many terms matched
+a whole token rather than just a prefix. Each term is resolved by its own
+range scan (`term <= token < successor`) on the table's primary key, so
+they use the same B-tree on SQLite and Postgres, and the per-term ids are
+combined with UNION ALL + GROUP BY.
+
+Location and Fish rows written through the session are indexed by the
+listener at the bottom; bulk loaders call index_rows() themselves.
+"""
+import re
+import unicodedata
+
+from sqlalchemy import event, inspect, select, insert, delete, and_, case, func, literal, union_all
+from sqlalchemy.orm import Session
+
+from api.geo import prefix_upper_bound
+from api.models import db, Location, Fish, SearchToken
+
+SEARCH_MODELS = {"location": Location, "fish": Fish}
+
+# tokens shorter than this are neither indexed nor searched
+MIN_TOKEN_LENGTH = 2
+MAX_TOKEN_LENGTH = 100
+MAX_QUERY_TERMS = 8
+
+# every character a token can contain, in the order databases sort them
+_TOKEN_ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyz"
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    if not text:
+        return set()
+    folded = unicodedata.normalize("NFKD", text).encode(
+        "ascii", "ignore").decode("ascii").lower()
+    return {token[:MAX_TOKEN_LENGTH] for token in _TOKEN_RE.findall(folded)
+            if len(token) >= MIN_TOKEN_LENGTH}
+
+
+def index_rows(connection, kind, rows):
+    """(Re)index `rows`, an iterable of (id, name) pairs of type `kind`."""
+    rows = list(rows)
+    if not rows:
+        return
+    remove_rows(connection, kind, [row_id for row_id, _ in rows])
+    tokens = [{"kind": kind, "token": token, "ref_id": row_id}
+              for row_id, name in rows for token in tokenize(name)]
+    if tokens:
+        connection.execute(insert(SearchToken), tokens)
+
+
+def remove_rows(connection, kind, ids):
+    if ids:
+        connection.execute(delete(SearchToken).where(
+            SearchToken.kind == kind, SearchToken.ref_id.in_(ids)))
+
+
+def _query_terms(query):
+    terms = sorted(tokenize(query), key=len, reverse=True)
+    # a term that prefixes a longer term adds nothing and would let one
+    # token satisfy two terms
+    kept = []
+    for term in terms:
+        if not any(other.startswith(term) for other in kept):
+            kept.append(term)
+    return kept[:MAX_QUERY_TERMS]
+
+
+def _prefix_match(term):
+    upper = prefix_upper_bound(term, _TOKEN_ALPHABET)
+    if upper is None:
+        return SearchToken.token >= term
+    return and_(SearchToken.token >= term, SearchToken.token < upper)
+
+
+def search(kind, query, limit, offset=0):
+    """Return (rows, has_more) for a page of `kind` rows matching `query`."""
+    model = SEARCH_MODELS[kind]
+    terms = _query_terms(query)
+    if not terms:
+        return [], False
+
+    # one primary-key range scan per term, combined afterwards: an OR of the
+    # ranges under one GROUP BY makes SQLite read every token of `kind`
+    # through the (kind, ref_id) index instead
+    hits = union_all(*[
+        select(SearchToken.ref_id.label("ref_id"), literal(i).label("term"),
+               case((SearchToken.token == term, 2), else_=1).label("score"))
+        .where(SearchToken.kind == kind, _prefix_match(term))
+        for i, term in enumerate(terms)]).subquery()
+    # best match per (row, term): 2 for a whole token, 1 for a prefix
+    per_term = (select(hits.c.ref_id, func.max(hits.c.score).label("score"))
+                .group_by(hits.c.ref_id, hits.c.term)
+                .subquery())
+    score = func.sum(per_term.c.score)
+    stmt = (select(per_term.c.ref_id, score.label("score"))
+            .group_by(per_term.c.ref_id)
+            .having(func.count() == len(terms))
+            .order_by(score.desc(), per_term.c.ref_id)
+            .limit(limit + 1)
+            .offset(offset))
+    ids = [row_id for row_id, _ in db.session.execute(stmt)]
+    has_more = len(ids) > limit
+    ids = ids[:limit]
+    by_id = {row.id: row for row in db.session.scalars(
+        select(model).where(model.id.in_(ids)))}
+    return [by_id[row_id] for row_id in ids if row_id in by_id], has_more
+
+
+def rebuild_index(kind, batch_size=1000):
+    """Drop and rebuild the whole index for `kind`. Returns rows indexed."""
+    model = SEARCH_MODELS[kind]
+    connection = db.session.connection()
+    connection.execute(delete(SearchToken).where(SearchToken.kind == kind))
+    total = 0
+    result = db.session.execute(
+        select(model.id, model.name).execution_options(yield_per=batch_size))
+    for rows in result.partitions():
+        tokens = [{"kind": kind, "token": token, "ref_id": row_id}
+                  for row_id, name in rows for token in tokenize(name)]
+        if tokens:
+            connection.execute(insert(SearchToken), tokens)
+        total += len(rows)
+    return total
+
+
+@event.listens_for(Session, "after_flush")
+def _index_flushed_rows(session, flush_context):
+    for kind, model in SEARCH_MODELS.items():
+        changed = [(obj.id, obj.name) for obj in session.new
+                   if isinstance(obj, model)]
+        changed += [(obj.id, obj.name) for obj in session.dirty
+                    if isinstance(obj, model)
+                    and inspect(obj).attrs.name.history.has_changes()]
+        removed = [obj.id for obj in session.deleted if isinstance(obj, model)]
+        if changed or removed:
+            connection = session.connection()
+            index_rows(connection, kind, changed)
+            remove_rows(connection, kind, removed)
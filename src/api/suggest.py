@@ -0,0 +1,179 @@
+"""
+In-memory prefix index behind GET /api/fish-species/suggest.
+
+Every word of every fish name becomes a key (the rest of the name from that
+word on, casefolded), e.g. "Largemouth Bass" -> "largemouth bass", "bass".
+Keys live in one sorted list with a parallel array of fish ids, so a lookup
+is a bisect plus a short forward scan and never touches the database.
+
+The index is loaded on first use (wsgi.py warms it at startup). Fish written
+through this process' session are applied on commit. Writes by other
+processes (`flask seed-fish`, another worker) bump change_counter["fish"]
+(see api.sync); the counter is read at most once every REFRESH_INTERVAL
+seconds and the index is rebuilt from scratch when it moved, which also
+catches deletes, renames and reused ids.
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from api.models import db, Fish
+from api.sync import FISH_COUNTER, current_change_version
+
+REFRESH_INTERVAL = 30
+# above this many new rows a full re-sort beats one sorted insert per key
+_BULK_THRESHOLD = 256
+
+
+def _keys_for(name):
+    words = name.casefold().split()
+    return [" ".join(words[i:]) for i in range(len(words))]
+
+
+def _sorted_keys(names):
+    pairs = sorted((key, row_id) for row_id, name in names.items()
+                   for key in _keys_for(name))
+    return [key for key, _ in pairs], array("q", (row_id for _, row_id in pairs))
+
+
+class PrefixIndex:
+    def __init__(self):
+        self._keys = []
+        self._ids = array("q")
+        self._names = {}
+        # change_counter["fish"] value the index was loaded at
+        self._version = None
+        self._loaded = False
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def _fresh(self):
+        return self._loaded and time.monotonic() - self._checked_at < REFRESH_INTERVAL
+
+    def ensure_loaded(self):
+        if self._fresh():
+            return
+        # while another thread refreshes, keep serving the current index
+        if not self._refresh_lock.acquire(blocking=not self._loaded):
+            return
+        try:
+            if self._fresh():
+                return
+            # read the counter first: a write racing the load moves it again
+            version = current_change_version(db.session, FISH_COUNTER)
+            if not self._loaded or version != self._version:
+                rows = db.session.execute(select(Fish.id, Fish.name)).all()
+                names = {row_id: name for row_id, name in rows if name}
+                keys, ids = _sorted_keys(names)
+                with self._lock:
+                    self._names, self._keys, self._ids = names, keys, ids
+                    self._version = version
+                    self._loaded = True
+            self._checked_at = time.monotonic()
+        finally:
+            self._refresh_lock.release()
+
+    def _rebuild(self, rows):
+        self._names = {row_id: name for row_id, name in rows if name}
+        self._keys, self._ids = _sorted_keys(self._names)
+
+    def add(self, rows):
+        """Add or replace (id, name) rows."""
+        rows = [(row_id, name) for row_id, name in rows if name]
+        with self._lock:
+            if not self._loaded:
+                return
+            for row_id, _ in rows:
+                self._remove_locked(row_id)
+            if len(rows) > _BULK_THRESHOLD:
+                self._rebuild(list(self._names.items()) + rows)
+                return
+            for row_id, name in rows:
+                self._names[row_id] = name
+                for key in _keys_for(name):
+                    pos = bisect_left(self._keys, key)
+                    # keep (key, id) order so equal keys stay sorted by id
+                    while pos < len(self._keys) and self._keys[pos] == key \
+                            and self._ids[pos] < row_id:
+                        pos += 1
+                    self._keys.insert(pos, key)
+                    self._ids.insert(pos, row_id)
+
+    def remove(self, ids):
+        with self._lock:
+            if self._loaded:
+                for row_id in ids:
+                    self._remove_locked(row_id)
+
+    def _remove_locked(self, row_id):
+        name = self._names.pop(row_id, None)
+        if name is None:
+            return
+        for key in _keys_for(name):
+            pos = bisect_left(self._keys, key)
+            while pos < len(self._keys) and self._keys[pos] == key:
+                if self._ids[pos] == row_id:
+                    del self._keys[pos]
+                    del self._ids[pos]
+                    break
+                pos += 1
+
+    def suggest(self, prefix, limit=10):
+        prefix = " ".join(prefix.casefold().split())
+        if not prefix:
+            return []
+        results = []
+        seen = set()
+        with self._lock:
+            keys, ids, names = self._keys, self._ids, self._names
+            pos = bisect_left(keys, prefix)
+            while pos < len(keys) and keys[pos].startswith(prefix):
+                row_id = ids[pos]
+                if row_id not in seen:
+                    seen.add(row_id)
+                    results.append({"id": row_id, "name": names[row_id]})
+                    if len(results) >= limit:
+                        break
+                pos += 1
+        return results
+
+
+fish_suggestions = PrefixIndex()
+
+
+# ---------------------------------------------------------------------------
+# Keep the index in step with Fish rows committed through this process
+# ---------------------------------------------------------------------------
+_PENDING_KEY = "fish_suggest_pending"
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_fish_changes(session, flush_context):
+    added = [(obj.id, obj.name) for obj in session.new if isinstance(obj, Fish)]
+    added += [(obj.id, obj.name) for obj in session.dirty
+              if isinstance(obj, Fish)
+              and inspect(obj).attrs.name.history.has_changes()]
+    removed = [obj.id for obj in session.deleted if isinstance(obj, Fish)]
+    if added or removed:
+        pending = session.info.setdefault(_PENDING_KEY, ([], []))
+        pending[0].extend(added)
+        pending[1].extend(removed)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_fish_changes(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        added, removed = pending
+        fish_suggestions.remove(removed)
+        fish_suggestions.add(added)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_fish_changes(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,124 @@
+"""
+Change versions for delta syncs of the Location table.
+
+Every flush that inserts, updates or deletes locations (or changes who likes
+them) takes the next value of change_counter["location"] and stamps it on
+the touched rows; deletions leave a LocationTombstone with that version.
+The counter is bumped with an UPDATE, so on Postgres concurrent writers
+queue on its row lock and versions become visible in commit order.
+
+change_counter["user"] and ["fish"] are bumped by every flush or bulk
+statement that writes users or fish. They stamp nothing; they tell any
+process that the data changed (api.cache's ETags, api.suggest's index).
+"""
+from sqlalchemy import event, inspect, select, update, insert
+from sqlalchemy.orm import Session
+
+from api.models import db, change_counter, User, Fish, Location, LocationTombstone
+from api.replica import WRITTEN_VERSIONS
+
+LOCATION_COUNTER = "location"
+USER_COUNTER = "user"
+FISH_COUNTER = "fish"
+# models/tables whose writes bump a counter that stamps no rows (location
+# bulk writes are stamped explicitly, see stamp_locations)
+_FLUSH_COUNTERS = ((User, USER_COUNTER), (Fish, FISH_COUNTER))
+_BULK_COUNTERS = {"user": USER_COUNTER, "fish": FISH_COUNTER}
+
+
+def next_change_version(session, name=LOCATION_COUNTER):
+    """Allocate and return the next version of counter `name`."""
+    conn = session.connection()
+    bumped = conn.execute(update(change_counter)
+                          .where(change_counter.c.name == name)
+                          .values(value=change_counter.c.value + 1))
+    if bumped.rowcount == 0:
+        conn.execute(insert(change_counter).values(name=name, value=1))
+    version = conn.execute(select(change_counter.c.value)
+                           .where(change_counter.c.name == name)).scalar_one()
+    # handed back to the client on commit for replica read-your-writes
+    session.info.setdefault(WRITTEN_VERSIONS, {})[name] = version
+    return version
+
+
+def current_change_version(session, name=LOCATION_COUNTER):
+    value = session.execute(select(change_counter.c.value)
+                            .where(change_counter.c.name == name)).scalar()
+    return value or 0
+
+
+def stamp_locations(session, location_ids):
+    """Give `location_ids` a new version after a bulk write to them or to
+    their likes (the before_flush listener below only sees ORM changes)."""
+    if not location_ids:
+        return None
+    version = next_change_version(session)
+    session.execute(update(Location)
+                    .where(Location.id.in_(location_ids))
+                    .values(version=version)
+                    .execution_options(synchronize_session=False))
+    return version
+
+
+def location_changes_since(since):
+    """Locations written and deleted after version `since`."""
+    version = current_change_version(db.session)
+    upserted = db.session.scalars(select(Location)
+                                  .where(Location.version > since)
+                                  .order_by(Location.version, Location.id)).all()
+    deleted = db.session.scalars(select(LocationTombstone.location_id)
+                                 .where(LocationTombstone.version > since)
+                                 .order_by(LocationTombstone.version)).all()
+    return {
+        "version": version,
+        "upserted": Location.serialize_many(upserted),
+        "deleted": deleted,
+    }
+
+
+@event.listens_for(Session, "before_flush")
+def _bump_counters(session, flush_context, instances):
+    for model, name in _FLUSH_COUNTERS:
+        if any(isinstance(obj, model) for obj in (*session.new, *session.deleted)) \
+                or any(isinstance(obj, model) and session.is_modified(obj)
+                       for obj in session.dirty):
+            next_change_version(session, name)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _bump_counters_on_bulk(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update
+            or orm_execute_state.is_delete):
+        return
+    table = getattr(orm_execute_state.statement, "table", None)
+    name = _BULK_COUNTERS.get(getattr(table, "name", None))
+    if name is not None:
+        next_change_version(orm_execute_state.session, name)
+
+
+@event.listens_for(Session, "before_flush")
+def _stamp_location_versions(session, flush_context, instances):
+    deleted = [obj for obj in session.deleted if isinstance(obj, Location)]
+    changed = [obj for obj in session.new if isinstance(obj, Location)]
+    for obj in session.dirty:
+        if isinstance(obj, Location) and session.is_modified(obj):
+            changed.append(obj)
+        elif isinstance(obj, User):
+            # likes edited from the user side change the locations' likers
+            history = inspect(obj).attrs.liked_locations.history
+            changed.extend(history.added)
+            changed.extend(history.deleted)
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            changed.extend(obj.liked_locations)
+    if not changed and not deleted:
+        return
+
+    version = next_change_version(session)
+    deleted_ids = {id(obj) for obj in deleted}
+    for obj in changed:
+        if id(obj) not in deleted_ids:
+            obj.version = version
+    for obj in deleted:
+        if obj.id is not None:
+            session.merge(LocationTombstone(location_id=obj.id, version=version))
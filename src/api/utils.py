@@ -1,4 +1,10 @@
-from flask import jsonify, url_for
+from flask import jsonify, url_for, request, current_app, Response, stream_with_context
+from api.models import db
+
+# keyset pagination / streaming defaults for list endpoints
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_CHUNK_SIZE = 500
 
 class APIException(Exception):
     status_code = 400
@@ -39,3 +45,99 @@ def generate_sitemap(app):
         <p>Start working on your project by following the <a href="https://start.4geeksacademy.com/starters/full-stack" target="_blank">Quick Start</a></p>
         <p>Remember to specify a real endpoint path like: </p>
         <ul style="text-align: left;">"""+links_html+"</ul></div>"
+
+def fast_serialize(endpoint):
+    """Whether `endpoint` ("location", "users", "fish") uses the column
+    projection path, see FAST_SERIALIZE in api.json_provider."""
+    return endpoint in current_app.config.get("FAST_SERIALIZE", ())
+
+
+def _selects_entity(stmt):
+    description = stmt.column_descriptions[0]
+    return len(stmt.column_descriptions) == 1 and description["expr"] is description["entity"]
+
+
+def list_response(stmt, key_column, serialize_rows):
+    """Build the response for a list endpoint from a select() statement.
+
+    `key_column` is the unique, indexed column used as the keyset cursor and
+    `serialize_rows` turns a list of rows into a list of dicts. Rows are ORM
+    objects for select(Model) and plain Row tuples for a column projection.
+
+    Query params understood:
+      (none)             plain JSON array with every row (legacy behaviour)
+      limit=&after=<id>  one page ordered by key_column:
+                         {"results": [...], "next_after": <id or null>}
+      stream=json|ndjson the whole result streamed in chunks from a
+                         server-side cursor; `after` and `limit` still apply
+    """
+    args = request.args
+    try:
+        limit = int(args["limit"]) if "limit" in args else None
+        after = int(args["after"]) if "after" in args else None
+    except ValueError:
+        raise APIException("limit and after must be integers", 400)
+    if limit is not None and not (1 <= limit <= MAX_PAGE_SIZE):
+        raise APIException(f"limit must be between 1 and {MAX_PAGE_SIZE}", 400)
+
+    stream = args.get("stream")
+    if stream is None and limit is None and after is None:
+        rows = _rows(db.session.execute(stmt), stmt).all()
+        return jsonify(serialize_rows(rows)), 200
+
+    stmt = stmt.order_by(key_column)
+    if after is not None:
+        stmt = stmt.where(key_column > after)
+
+    if stream is not None:
+        if stream not in ("json", "ndjson"):
+            raise APIException("stream must be 'json' or 'ndjson'", 400)
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        return _stream_rows(stmt, serialize_rows, ndjson=(stream == "ndjson"))
+
+    limit = limit or DEFAULT_PAGE_SIZE
+    # fetch one extra row to know whether there is a next page
+    rows = _rows(db.session.execute(stmt.limit(limit + 1)), stmt).all()
+    next_after = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_after = getattr(rows[-1], key_column.key)
+    return jsonify({"results": serialize_rows(rows), "next_after": next_after}), 200
+
+
+def _rows(result, stmt):
+    return result.scalars() if _selects_entity(stmt) else result
+
+
+def _stream_rows(stmt, serialize_rows, ndjson=False):
+    # yield_per makes SQLAlchemy use a server-side cursor where the driver
+    # supports one, so only STREAM_CHUNK_SIZE rows are held at a time
+    entities = _selects_entity(stmt)
+    result = _rows(db.session.execute(
+        stmt.execution_options(yield_per=STREAM_CHUNK_SIZE)), stmt)
+
+    def generate():
+        dumps = current_app.json.dumps
+        first = True
+        if not ndjson:
+            yield "["
+        for rows in result.partitions():
+            items = serialize_rows(rows)
+            if ndjson:
+                yield "".join(dumps(item) + "\n" for item in items)
+            else:
+                chunk = ",".join(dumps(item) for item in items)
+                if chunk:
+                    yield chunk if first else "," + chunk
+                    first = False
+            # drop this chunk's objects; expunge_all() would also discard the
+            # identity map the yield_per result is still loading into
+            if entities:
+                for obj in rows:
+                    db.session.expunge(obj)
+        if not ndjson:
+            yield "]"
+
+    mimetype = "application/x-ndjson" if ndjson else "application/json"
+    return Response(stream_with_context(generate()), mimetype=mimetype)
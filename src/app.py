@@ -10,6 +10,15 @@ from api.models import db
 from api.routes import api
 from api.admin import setup_admin
 from api.commands import setup_commands
+from api.cache import setup_cache
+from api.profiling import setup_profiling
+from api.passwords import setup_passwords
+from api.database import engine_options
+from api.replica import replica_binds, setup_replica
+from api.json_provider import setup_json
+from api.metrics import setup_metrics
+from api.query_detector import setup_query_detector
+from api.compression import setup_compression
 from flask_jwt_extended import JWTManager
 
 # from models import Person
@@ -29,6 +38,15 @@ else:
     app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:////tmp/test.db"
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# pool size, recycling, pre-ping and statement timeout (DB_* variables)
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(
+    app.config['SQLALCHEMY_DATABASE_URI'])
+# optional read replica for GET handlers (see api/replica.py)
+replica_url = os.getenv("DATABASE_REPLICA_URL")
+if replica_url is not None:
+    replica_url = replica_url.replace("postgres://", "postgresql://")
+    app.config['SQLALCHEMY_BINDS'] = replica_binds(
+        replica_url, engine_options(replica_url))
 MIGRATE = Migrate(app, db, compare_type=True)
 db.init_app(app)
 
@@ -44,6 +62,32 @@ setup_admin(app)
 # add the admin
 setup_commands(app)
 
+# X-Profile: <PROFILE_TOKEN> runs a request under cProfile (registered
+# first so it also covers the other hooks)
+setup_profiling(app)
+
+# configure the in-process response cache
+setup_cache(app)
+
+# size the password hashing pool and set the hash cost
+setup_passwords(app)
+
+# read-your-writes window for the replica
+setup_replica(app)
+
+# orjson-backed JSON and the per-endpoint column projection switch
+setup_json(app)
+
+# per-endpoint latency/SQL/size metrics at /metrics (before compression,
+# so the recorded size is what was sent)
+setup_metrics(app)
+
+# N+1 / slow query warnings (on with FLASK_DEBUG, QUERY_DETECTOR=raise in tests)
+setup_query_detector(app)
+
+# gzip/brotli for large API responses
+setup_compression(app)
+
 # Add all endpoints form the API with a "api" prefix
 app.register_blueprint(api, url_prefix='/api')
 
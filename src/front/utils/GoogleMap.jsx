@@ -117,29 +117,28 @@ export default function MapBasic({
         setFavorites(Array.isArray(user.liked_location_ids) ? user.liked_location_ids : []);
     }, [user.liked_location_ids]);
 
-    // Persist favorites to backend and also sync the local user object
+    // Persist a single like/unlike to the backend and also sync the local user object
     const [savingFavs, setSavingFavs] = useState(false);
-    async function persistFavorites(nextIds) {
+    async function persistFavorite(id, liked) {
         if (!token) {
             toast.error("Please login to favorite spots.");
             return false;
         }
         setSavingFavs(true);
         try {
-            const res = await fetch(`${API_BASE}/api/user`, {
-                method: "PUT",
-                headers: {
-                    "Content-Type": "application/json",
-                    Authorization: `Bearer ${token}`,
-                },
-                body: JSON.stringify({ liked_locations: nextIds }),
+            const res = await fetch(`${API_BASE}/api/user/likes/${id}`, {
+                method: liked ? "POST" : "DELETE",
+                headers: { Authorization: `Bearer ${token}` },
             });
             if (!res.ok) {
                 const data = await res.json().catch(() => ({}));
                 throw new Error(data?.message || `Failed to update favorites (HTTP ${res.status})`);
             }
             // keep the user object in sync so refresh shows the right state immediately
-            setUser((prev) => ({ ...prev, liked_location_ids: [...nextIds] }));
+            setUser((prev) => {
+                const ids = (prev.liked_location_ids || []).filter((i) => i !== id);
+                return { ...prev, liked_location_ids: liked ? [...ids, id] : ids };
+            });
             return true;
         } catch (err) {
             toast.error(String(err.message || err));
@@ -162,7 +161,7 @@ export default function MapBasic({
         setFavorites(next);
         toast.success(isFav ? `${h.name} removed from favorites` : `${h.name} added to favorites`);
 
-        const ok = await persistFavorites(next);
+        const ok = await persistFavorite(h.id, !isFav);
         if (!ok) {
             // rollback
             setFavorites((prev) => (isFav ? [...prev, h.id] : prev.filter((i) => i !== h.id)));
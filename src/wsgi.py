@@ -2,6 +2,14 @@
 # Read more about it here: https://devcenter.heroku.com/articles/python-gunicorn
 
 from app import app as application
+from api.suggest import fish_suggestions
+
+# build the in-memory fish typeahead index before taking traffic
+with application.app_context():
+    try:
+        fish_suggestions.ensure_loaded()
+    except Exception as e:
+        application.logger.warning("Could not warm fish suggestions: %s", e)
 
 if __name__ == "__main__":
     application.run()
@@ -0,0 +1,156 @@
+"""
+Shared fixtures: the Flask app on a throwaway SQLite database.
+
+The app reads its configuration from the environment at import time, so
+the variables are set here before `app` is imported. QUERY_DETECTOR=raise
+makes any request that repeats a statement QUERY_DETECTOR_REPEAT times fail
+with QueryBudgetExceeded (see api.query_detector).
+"""
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import textwrap
+from contextlib import contextmanager
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, event, func, insert, select
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+_DB_FILE = Path(tempfile.mkdtemp(prefix="fish-and-hunt-tests-")) / "test.db"
+os.environ["DATABASE_URL"] = f"sqlite:///{_DB_FILE}"
+os.environ.setdefault("FLASK_APP_KEY", "test-secret")
+os.environ["QUERY_DETECTOR"] = "raise"
+# slow statements are not what the tests look for, only repeated ones
+os.environ.setdefault("QUERY_DETECTOR_SLOW_MS", "10000")
+os.environ.setdefault("PASSWORD_HASH_ITERATIONS", "1000")
+for name in ("DATABASE_REPLICA_URL", "PROFILE_TOKEN", "METRICS_TOKEN"):
+    os.environ.pop(name, None)
+
+from app import app as flask_app  # noqa: E402
+from api.models import db, User, Location, user_likes  # noqa: E402
+from api.query_detector import query_detector as _query_detector  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def app():
+    flask_app.config["TESTING"] = True
+    return flask_app
+
+
+@pytest.fixture
+def query_detector(app):
+    """api.query_detector, which fails every request of the suite that runs
+    one statement QUERY_DETECTOR_REPEAT times or more."""
+    assert _query_detector.mode == "raise"
+    return _query_detector
+
+
+@pytest.fixture
+def database(app):
+    """Empty tables for each test. No app context is left pushed, so every
+    test client request gets its own, as under a real server."""
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return db
+
+
+@pytest.fixture
+def replica(app, database, tmp_path, monkeypatch):
+    """A "replica" bind on a second SQLite file. It only changes when the
+    test calls the returned catch_up(), which copies the primary over it."""
+    replica_file = tmp_path / "replica.db"
+
+    def catch_up():
+        with sqlite3.connect(_DB_FILE) as source, sqlite3.connect(replica_file) as target:
+            source.backup(target)
+
+    catch_up()
+    engine = create_engine(f"sqlite:///{replica_file}")
+    with app.app_context():
+        monkeypatch.setitem(db.engines, "replica", engine)
+    yield catch_up
+    engine.dispose()
+
+
+@pytest.fixture
+def client(app, database):
+    return app.test_client()
+
+
+@pytest.fixture
+def seed(app, database):
+    """seed(users, locations): add users and locations, each location created
+    by and liked by a couple of users. Ids continue across calls."""
+    def add(users, locations):
+        with app.app_context():
+            _add(users, locations)
+
+    def _add(users, locations):
+        first = db.session.scalar(select(func.count()).select_from(User))
+        new_users = [User(email=f"user{first + i}@example.com", user_name=f"user{first + i}",
+                          password="x") for i in range(users)]
+        db.session.add_all(new_users)
+        db.session.flush()
+        user_ids = [user.id for user in new_users]
+        new_locations = [Location(name=f"Spot {i}", type="fishing" if i % 2 else "hunting",
+                                  position={"lat": 25 + i / 1000, "lng": -80 - i / 1000},
+                                  directions="x", creator_id=user_ids[i % users])
+                         for i in range(locations)]
+        db.session.add_all(new_locations)
+        db.session.flush()
+        likes = {(user_ids[(i + k) % users], loc.id)
+                 for i, loc in enumerate(new_locations) for k in range(2)}
+        # user 1 likes everything, so GET /api/user grows with the data too
+        likes |= {(1, loc.id) for loc in new_locations}
+        db.session.execute(insert(user_likes), [
+            {"user_id": user_id, "location_id": location_id} for user_id, location_id in likes])
+        db.session.commit()
+    return add
+
+
+@pytest.fixture
+def auth_headers(app):
+    """Authorization header for the user with the given id."""
+    from flask_jwt_extended import create_access_token
+
+    def headers(user_id=1):
+        with app.test_request_context():
+            return {"Authorization": f"Bearer {create_access_token(identity=str(user_id))}"}
+    return headers
+
+
+@contextmanager
+def count_queries():
+    """Collect the statements run on the app's engine inside the block."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with flask_app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def run_in_other_process(code):
+    """Run `code` with `app`, `db` and the models in scope inside an
+    app context of a separate Python process on the same database."""
+    script = textwrap.dedent("""
+        import sys
+        sys.path.insert(0, {src!r})
+        from app import app
+        from sqlalchemy import delete, insert, update
+        from api.models import db, User, Location, Fish
+        with app.app_context():
+    """).format(src=str(ROOT / "src")) + textwrap.indent(textwrap.dedent(code), "    ")
+    subprocess.run([sys.executable, "-c", script], check=True, env=os.environ.copy())
@@ -0,0 +1,57 @@
+"""
+ETags must change when *another process* writes, not only this one.
+"""
+import pytest
+
+from conftest import run_in_other_process
+
+
+@pytest.mark.parametrize("url, write", [
+    ("/api/location", """
+        user = db.session.get(User, 2)
+        user.liked_locations.append(db.session.get(Location, 3))
+        db.session.commit()
+    """),
+    ("/api/users", """
+        db.session.get(User, 2).user_name = "renamed"
+        db.session.commit()
+    """),
+    ("/api/user", """
+        location = db.session.get(Location, 1)
+        location.liked_by_users.remove(db.session.get(User, 1))
+        db.session.commit()
+    """),
+], ids=["location", "users", "user"])
+def test_write_from_another_process_changes_etag(client, seed, auth_headers, url, write):
+    seed(3, 3)
+    headers = auth_headers()
+    first = client.get(url, headers=headers)
+    assert first.status_code == 200 and first.headers["ETag"]
+    assert client.get(url, headers={**headers, "If-None-Match": first.headers["ETag"]}) \
+        .status_code == 304
+
+    run_in_other_process(write)
+
+    again = client.get(url, headers={**headers, "If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 200
+    assert again.headers["ETag"] != first.headers["ETag"]
+    assert again.get_json() != first.get_json()
+
+
+def test_rename_from_another_process_reaches_cached_identity(client, seed, auth_headers):
+    seed(3, 3)
+    headers = auth_headers()
+    first = client.get("/api/user", headers=headers)
+    # the identity cache now holds user 1
+    assert client.get("/api/user", headers=headers).get_json() == first.get_json()
+
+    run_in_other_process("""
+        db.session.get(User, 1).user_name = "renamed"
+        db.session.commit()
+    """)
+
+    again = client.get("/api/user", headers={**headers, "If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 200
+    assert again.get_json()["user_name"] == "renamed"
+    assert client.get("/api/user", headers={**headers, "If-None-Match": again.headers["ETag"]}) \
+        .status_code == 304
@@ -0,0 +1,22 @@
+from sqlalchemy import delete
+
+from api import routes
+from api.models import db, Location
+
+
+def test_candidate_deleted_before_hydration_is_skipped(app, client, seed, monkeypatch):
+    seed(2, 3)
+    rank = routes.rank_by_distance
+
+    def rank_then_delete(*args, **kwargs):
+        ranked = rank(*args, **kwargs)
+        # another request deletes the nearest candidate in between
+        with db.engine.begin() as conn:
+            conn.execute(delete(Location.__table__).where(Location.id == ranked[0][0]))
+        return ranked
+
+    monkeypatch.setattr(routes, "rank_by_distance", rank_then_delete)
+    response = client.get("/api/location/nearby?lat=25&lng=-80&radius_km=50")
+    assert response.status_code == 200
+    assert [item["id"] for item in response.get_json()] == [2, 3]
+    assert all("distance_km" in item for item in response.get_json())
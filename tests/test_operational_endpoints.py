@@ -0,0 +1,27 @@
+import pytest
+
+URLS = ["/api/location/cache-stats", "/api/db/pool-stats"]
+
+
+@pytest.mark.parametrize("url", URLS)
+def test_requires_metrics_token_when_set(client, monkeypatch, url):
+    monkeypatch.setenv("METRICS_TOKEN", "secret")
+    assert client.get(url).status_code == 401
+    assert client.get(url, headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert client.get(url, headers={"Authorization": "Bearer secret"}).status_code == 200
+
+
+@pytest.mark.parametrize("url", URLS + ["/metrics"])
+def test_non_ascii_authorization_is_rejected(client, monkeypatch, url):
+    if url == "/metrics":
+        pytest.importorskip("prometheus_client")
+    monkeypatch.setenv("METRICS_TOKEN", "secret")
+    assert client.get(url, headers={"Authorization": "Bearer caf\u00e9"}).status_code == 401
+
+
+def test_pool_stats_are_keyed_by_bind(client):
+    client.get("/api/users")
+    stats = client.get("/api/db/pool-stats").get_json()
+    assert list(stats) == ["primary"]
+    assert stats["primary"]["checkouts"] >= 1
+    assert stats["primary"]["checked_out"] == 0
@@ -0,0 +1,39 @@
+"""
+The list endpoints must load related rows in batches: the number of
+statements per request may not grow with the number of rows returned.
+"""
+import pytest
+
+from conftest import count_queries
+
+N = 20
+
+
+def _queries(client, url, headers=None):
+    with count_queries() as statements:
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return len(statements)
+
+
+@pytest.mark.parametrize("url", ["/api/location", "/api/users", "/api/location?limit=500"])
+@pytest.mark.parametrize("fast", [True, False], ids=["projection", "orm"])
+def test_list_query_count_is_constant(app, client, seed, monkeypatch, url, fast):
+    if not fast:
+        monkeypatch.setitem(app.config, "FAST_SERIALIZE", set())
+    seed(N, N)
+    small = _queries(client, url)
+    seed(9 * N, 9 * N)
+    large = _queries(client, url)
+    assert small == large
+
+
+def test_current_user_query_count_is_constant(client, seed, auth_headers):
+    # the first request also fills the identity cache, measure the second
+    seed(N, N)
+    client.get("/api/user", headers=auth_headers())
+    small = _queries(client, "/api/user", auth_headers())
+    seed(9 * N, 9 * N)
+    client.get("/api/user", headers=auth_headers())
+    large = _queries(client, "/api/user", auth_headers())
+    assert small == large
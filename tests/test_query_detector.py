@@ -0,0 +1,35 @@
+"""
+QUERY_DETECTOR=raise (set in conftest) turns N+1 patterns into failures.
+"""
+import pytest
+from flask import jsonify
+
+from app import app as flask_app
+from api.models import db, User
+from api.query_detector import QueryBudgetExceeded
+
+
+# registered at import, before the app handles its first request
+@flask_app.route("/_tests/n-plus-one")
+def n_plus_one():
+    users = db.session.scalars(db.select(User).order_by(User.id)).all()
+    # one lazy load per user
+    return jsonify({user.id: len(user.liked_locations) for user in users})
+
+
+def test_n_plus_one_view_fails(client, seed, query_detector):
+    seed(query_detector.repeat_threshold * 2, 10)
+    with pytest.raises(QueryBudgetExceeded) as raised:
+        client.get("/_tests/n-plus-one")
+    finding = raised.value.findings[0]
+    assert finding["kind"] == "repeated"
+    assert finding["count"] >= query_detector.repeat_threshold * 2
+
+
+@pytest.mark.parametrize("url", ["/api/location", "/api/users", "/api/user",
+                                 "/api/location/top", "/api/fish-species"])
+def test_list_endpoints_pass(client, seed, auth_headers, query_detector, url):
+    seed(query_detector.repeat_threshold * 4, query_detector.repeat_threshold * 10)
+    response = client.get(url, headers=auth_headers())
+    assert response.status_code == 200
+    assert int(response.headers["X-Query-Count"]) > 0
@@ -0,0 +1,37 @@
+"""
+Hot lookups must use an index, not scan the table (SQLite query plans).
+"""
+from sqlalchemy import select
+
+from api.models import db, Location, user_likes
+
+
+def _plan(stmt):
+    compiled = stmt.compile(db.engine, compile_kwargs={"literal_binds": True})
+    rows = db.session.execute(db.text(f"EXPLAIN QUERY PLAN {compiled}")).all()
+    return " / ".join(row[-1] for row in rows)
+
+
+def test_likers_of_a_page_use_the_location_index(app, seed):
+    seed(5, 20)
+    with app.app_context():
+        stmt = select(user_likes.c.location_id, user_likes.c.user_id) \
+            .where(user_likes.c.location_id.in_([1, 2, 3])).order_by(user_likes.c.user_id)
+        plan = _plan(stmt)
+    assert "SCAN user_likes" not in plan, plan
+    assert "ix_user_likes_location_id_user_id" in plan, plan
+
+
+def test_multi_term_search_range_scans_each_term(app, database, monkeypatch):
+    from api import search
+
+    statements = []
+    with app.app_context():
+        execute = db.session.execute
+        monkeypatch.setattr(db.session, "execute",
+                            lambda stmt, *a, **kw: statements.append(stmt) or execute(stmt, *a, **kw))
+        search.search("location", "cedar lake pier", 20)
+        monkeypatch.undo()
+        plan = _plan(statements[0])
+    assert "ix_search_token_kind_ref_id" not in plan, plan
+    assert plan.count("sqlite_autoindex_search_token_1 (kind=? AND token>? AND token<?)") == 3, plan
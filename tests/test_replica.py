@@ -0,0 +1,71 @@
+"""
+Reads routed to a lagging replica must stay consistent with their ETags
+and response-cache keys, and must not hide a client's own writes.
+"""
+from sqlalchemy import func, select
+
+from api.models import db, user_likes
+from conftest import run_in_other_process
+
+LIKE_FROM_ANOTHER_WORKER = """
+    user = db.session.get(User, 2)
+    user.liked_locations.append(db.session.get(Location, 3))
+    db.session.commit()
+"""
+
+
+def _likers(response, location_id=3):
+    return next(item["liked_by_user_ids"] for item in response.get_json()
+                if item["id"] == location_id)
+
+
+def test_lagging_replica_body_is_not_stored_under_a_newer_tag(client, seed, replica):
+    seed(3, 3)
+    replica()
+    before = client.get("/api/location")
+    assert 2 not in _likers(before)
+
+    run_in_other_process(LIKE_FROM_ANOTHER_WORKER)
+    # the replica has not seen the like yet: its body and its tag agree
+    lagging = client.get("/api/location")
+    assert 2 not in _likers(lagging)
+    assert lagging.headers["ETag"] == before.headers["ETag"]
+
+    replica()
+    again = client.get("/api/location", headers={"If-None-Match": lagging.headers["ETag"]})
+    assert again.status_code == 200
+    assert 2 in _likers(again)
+    fresh = client.get("/api/location")
+    assert fresh.headers["X-Cache"] == "HIT" and 2 in _likers(fresh)
+
+
+def _liked_ids(response):
+    return [item["id"] for item in response.get_json()["liked_locations"]]
+
+
+def test_own_write_reads_from_primary_until_replica_catches_up(app, client, seed, replica, auth_headers):
+    seed(3, 3)
+    replica()
+    headers = auth_headers(1)
+    unliked = client.delete("/api/user/likes/3", headers=headers)
+    assert unliked.status_code == 200
+    marker = unliked.headers["X-Read-After"]
+    assert "location:" in marker and client.get_cookie("read_after").value == marker
+
+    # the cookie (or the header, for clients without one) pins its reads
+    # to the primary while the replica lags; nothing is kept per process
+    assert 3 not in _liked_ids(client.get("/api/user", headers=headers))
+    other_client = app.test_client()
+    assert 3 not in _liked_ids(other_client.get(
+        "/api/user", headers={**headers, "X-Read-After": marker}))
+    # a client that wrote nothing (e.g. another one behind the same
+    # router address) keeps reading the replica
+    assert 3 in _liked_ids(app.test_client().get("/api/user", headers=headers))
+
+    replica()
+    # caught up: back on the replica, which has not seen this later write
+    run_in_other_process(LIKE_FROM_ANOTHER_WORKER.replace("User, 2", "User, 1"))
+    assert 3 not in _liked_ids(client.get("/api/user", headers=headers))
+    with app.app_context():
+        assert db.session.scalar(select(func.count()).select_from(user_likes).where(
+            user_likes.c.user_id == 1, user_likes.c.location_id == 3)) == 1
@@ -0,0 +1,20 @@
+from api.models import db, Fish
+
+NAMES = ["Cedar Lake", "Lake Cedarville", "Cedar River", "Blue Lake", "Cedar Lakeside Pond"]
+
+
+def _search(client, q, **params):
+    response = client.get("/api/search", query_string={"q": q, "kind": "fish", **params})
+    assert response.status_code == 200
+    return [item["name"] for item in response.get_json()["results"]]
+
+
+def test_every_term_must_match_and_whole_tokens_rank_first(app, client):
+    with app.app_context():
+        db.session.add_all([Fish(name=name) for name in NAMES])
+        db.session.commit()
+    assert _search(client, "cedar lake") == ["Cedar Lake", "Lake Cedarville", "Cedar Lakeside Pond"]
+    assert _search(client, "ced la") == ["Cedar Lake", "Lake Cedarville", "Cedar Lakeside Pond"]
+    assert _search(client, "lake blue") == ["Blue Lake"]
+    assert _search(client, "cedar lake river") == []
+    assert _search(client, "cedar lake", limit=1, offset=1) == ["Lake Cedarville"]
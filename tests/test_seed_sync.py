@@ -0,0 +1,34 @@
+"""
+seed-fish and seed-fish --sync must agree on which duplicate wins.
+"""
+import json
+
+from api.models import db, Fish
+
+FEED = [
+    {"name": "Rainbow Trout", "url": "https://example.com/first"},
+    {"name": "Brook Trout", "url": "https://example.com/brook"},
+    {"name": "Rainbow Trout", "url": "https://example.com/second"},
+]
+
+
+def _links(app):
+    with app.app_context():
+        return dict(db.session.execute(db.select(Fish.name, Fish.wiki_link)).all())
+
+
+def test_sync_after_seed_keeps_the_first_duplicate(app, database, tmp_path):
+    feed = tmp_path / "fish.json"
+    feed.write_text(json.dumps(FEED))
+    runner = app.test_cli_runner()
+
+    runner.invoke(args=["seed-fish", "--file", str(feed)], catch_exceptions=False)
+    seeded = _links(app)
+    assert seeded["Rainbow Trout"] == "https://example.com/first"
+
+    # small batches put the duplicate in a later batch than the original
+    for batch_size in ("1000", "1"):
+        result = runner.invoke(args=["seed-fish", "--file", str(feed), "--sync",
+                                     "--batch-size", batch_size], catch_exceptions=False)
+        assert "Updated: 0, Unchanged: 2, Deleted: 0, Duplicates: 1" in result.output
+        assert _links(app) == seeded
@@ -0,0 +1,15 @@
+"""
+The column projection and ORM serialization paths must return the same JSON.
+"""
+import pytest
+
+from api.cache import location_cache
+
+
+@pytest.mark.parametrize("url", ["/api/location", "/api/users"])
+def test_projection_matches_orm(app, client, seed, monkeypatch, url):
+    monkeypatch.setattr(location_cache, "maxsize", 0)
+    seed(5, 12)
+    projected = client.get(url).get_json()
+    monkeypatch.setitem(app.config, "FAST_SERIALIZE", set())
+    assert client.get(url).get_json() == projected
@@ -0,0 +1,22 @@
+import json
+
+import pytest
+
+from api import utils
+
+
+@pytest.mark.parametrize("url", ["/api/location?stream=ndjson", "/api/users?stream=json"])
+@pytest.mark.parametrize("fast", [True, False], ids=["projection", "orm"])
+def test_streams_more_than_one_chunk(app, client, seed, monkeypatch, url, fast):
+    monkeypatch.setattr(utils, "STREAM_CHUNK_SIZE", 7)
+    if not fast:
+        monkeypatch.setitem(app.config, "FAST_SERIALIZE", set())
+    seed(30, 30)
+    response = client.get(url)
+    assert response.status_code == 200
+    body = response.get_data(as_text=True)
+    items = [json.loads(line) for line in body.splitlines()] if "ndjson" in url \
+        else json.loads(body)
+    assert [item["id"] for item in items] == list(range(1, 31))
+    assert all(item["liked_by_user_ids" if "location" in url else "liked_location_ids"]
+               for item in items)
@@ -0,0 +1,60 @@
+"""
+The fish suggestion index must follow writes made by other processes,
+including deletes, renames and ids reused after a clear.
+"""
+import pytest
+
+from conftest import run_in_other_process
+
+from api import suggest
+from api.models import db, Fish
+
+
+@pytest.fixture
+def index(app, database, monkeypatch):
+    monkeypatch.setattr(suggest, "REFRESH_INTERVAL", 0)
+    with app.app_context():
+        db.session.add_all([Fish(name="Largemouth Bass"), Fish(name="Smallmouth Bass"),
+                            Fish(name="Rainbow Trout")])
+        db.session.commit()
+    index = suggest.PrefixIndex()
+
+    def lookup(prefix):
+        with app.app_context():
+            index.ensure_loaded()
+            return [row["name"] for row in index.suggest(prefix)]
+    return lookup
+
+
+def test_sees_inserts_from_another_process(index):
+    assert index("bass") == ["Largemouth Bass", "Smallmouth Bass"]
+    run_in_other_process("""
+        db.session.execute(insert(Fish), [{"name": "Striped Bass"}])
+        db.session.commit()
+    """)
+    assert index("bass") == ["Largemouth Bass", "Smallmouth Bass", "Striped Bass"]
+
+
+def test_sees_deletes_and_renames_from_another_process(index):
+    assert index("bass") == ["Largemouth Bass", "Smallmouth Bass"]
+    run_in_other_process("""
+        db.session.execute(delete(Fish).where(Fish.name == "Smallmouth Bass"))
+        db.session.execute(update(Fish).where(Fish.name == "Largemouth Bass")
+                           .values(name="Largemouth Perch"))
+        db.session.commit()
+    """)
+    assert index("bass") == []
+    assert index("perch") == ["Largemouth Perch"]
+
+
+def test_sees_reused_ids_after_clear(index):
+    assert index("rainbow") == ["Rainbow Trout"]
+    run_in_other_process("""
+        db.session.execute(delete(Fish))
+        db.session.commit()
+        db.session.execute(insert(Fish), [{"name": "Brook Trout"}, {"name": "Lake Trout"},
+                                          {"name": "Brown Trout"}])
+        db.session.commit()
+    """)
+    assert index("rainbow") == []
+    assert index("trout") == ["Brook Trout", "Lake Trout", "Brown Trout"]